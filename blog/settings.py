@@ -11,8 +11,12 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 
+from .database import databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -55,6 +59,7 @@ MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "myblog.db_router.ReplicaPinMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     'allauth.account.middleware.AccountMiddleware',
@@ -85,13 +90,17 @@ WSGI_APPLICATION = "blog.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
-}
+# 由环境变量决定：DATABASE_URL（PostgreSQL 或 SQLite）、DATABASE_REPLICA_URLS（逗号分隔的只读副本），
+# 以及 DB_CONN_MAX_AGE / DB_POOL* 连接复用参数，见 blog/database.py
+DATABASES = databases(BASE_DIR / "db.sqlite3")
 
+# 文章/评论接口的安全读请求路由到副本；写请求后 REPLICA_PIN_SECONDS 秒内该客户端仍读主库
+DATABASE_ROUTERS = ['myblog.db_router.ReplicaRouter'] if len(DATABASES) > 1 else []
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '5'))
+
+# SQLite 时把评论写入交给单个写线程串行执行（单连接），避免并发写锁冲突；默认关闭
+# SQLite 连接参数（WAL、mmap、busy_timeout 等）见 SQLITE_* 环境变量与 blog/database.py
+SQLITE_WRITE_QUEUE = os.environ.get('SQLITE_WRITE_QUEUE', 'false').lower() == 'true'
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -131,6 +140,19 @@ STATIC_URL = "static/"
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# 分片上传未完成的临时文件目录，必须在 MEDIA_ROOT 之外（不对外提供），最好与其同一文件系统
+CHUNKED_UPLOAD_DIR = os.environ.get('CHUNKED_UPLOAD_DIR', str(BASE_DIR / '.uploads'))
+
+# 前台站点地址，用于订阅源和 sitemap 中的文章链接；为空时使用请求的域名
+SITE_URL = os.environ.get('SITE_URL', '')
+
+# 订阅源/sitemap 文档缓存：所在缓存别名（多进程部署应指向共享缓存）与过期时间（秒）
+FEED_CACHE_ALIAS = os.environ.get('FEED_CACHE_ALIAS', 'default')
+FEED_CACHE_TIMEOUT = int(os.environ.get('FEED_CACHE_TIMEOUT', '3600'))
+
+# 静态快照输出目录（publish_static_snapshot），Web 服务器直接以 <root>/current 为根目录提供服务
+STATIC_SNAPSHOT_ROOT = Path(os.environ.get('STATIC_SNAPSHOT_ROOT', BASE_DIR / 'snapshot'))
+
 # Optional object storage (S3 compatible). Configure via env vars when used.
 OBJECT_STORAGE = {
     'bucket': os.environ.get('OBJECT_STORAGE_BUCKET'),
@@ -141,8 +163,52 @@ OBJECT_STORAGE = {
     'public_domain': os.environ.get('OBJECT_STORAGE_PUBLIC_DOMAIN'),  # optional CDN/domain
     'use_ssl': os.environ.get('OBJECT_STORAGE_USE_SSL', 'true').lower() != 'false',
     'default_acl': os.environ.get('OBJECT_STORAGE_DEFAULT_ACL', 'public-read'),
+    # Direct (presigned) uploads from the browser
+    'presign_expires': int(os.environ.get('OBJECT_STORAGE_PRESIGN_EXPIRES', '900')),
+    'max_upload_size': int(os.environ.get('OBJECT_STORAGE_MAX_UPLOAD_SIZE', str(10 * 1024 * 1024))),
+}
+
+# 匿名 GET 响应缓存，按依赖标签失效。BACKEND: locmem（进程内 LRU）或 django（使用 CACHES 中的共享缓存）
+RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() != 'false',
+    'BACKEND': os.environ.get('RESPONSE_CACHE_BACKEND', 'locmem'),
+    'CACHE_ALIAS': os.environ.get('RESPONSE_CACHE_ALIAS', 'default'),
+    'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', '300')),
+    # 过期后仍可返回旧响应的时长（期间由一个请求负责刷新）
+    'STALE_TTL': int(os.environ.get('RESPONSE_CACHE_STALE_TTL', '60')),
+    # 合并并发未命中：计算租约超时与等待者最长等待时间（秒）
+    'LOCK_TIMEOUT': int(os.environ.get('RESPONSE_CACHE_LOCK_TIMEOUT', '10')),
+    'WAIT_TIMEOUT': int(os.environ.get('RESPONSE_CACHE_WAIT_TIMEOUT', '5')),
+    'MAX_ENTRIES': int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '2048')),
+    # locmem 下标签版本单独存放的容量，响应体不会把标签版本挤出
+    'MAX_TAGS': int(os.environ.get('RESPONSE_CACHE_MAX_TAGS', '100000')),
+}
+
+# 缓存响应/订阅源的预压缩：小于 MIN_SIZE 字节不压缩；BACKGROUND 时在后台线程压缩，不阻塞填充缓存的请求
+COMPRESSION = {
+    'MIN_SIZE': int(os.environ.get('COMPRESSION_MIN_SIZE', '512')),
+    'GZIP_LEVEL': int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6')),
+    'BROTLI_QUALITY': int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5')),
+    'BACKGROUND': os.environ.get('COMPRESSION_BACKGROUND', 'true').lower() != 'false',
+}
+
+# ASGI 部署时文章列表/详情、评论树、分类/标签的匿名读请求使用原生异步视图（myblog/async_views.py）
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'false').lower() == 'true'
+
+# 评论 SSE 推送（/api/posts/<slug>/comments/stream/，仅 ASGI 部署可用，WSGI 下返回 501）：locmem 为进程内，多进程部署用 django（共享缓存轮询）
+COMMENT_STREAM = {
+    'BACKEND': os.environ.get('COMMENT_STREAM_BACKEND', 'locmem'),
+    'CACHE_ALIAS': os.environ.get('COMMENT_STREAM_CACHE_ALIAS', 'default'),
+    'HISTORY': int(os.environ.get('COMMENT_STREAM_HISTORY', '200')),
+    'HEARTBEAT': int(os.environ.get('COMMENT_STREAM_HEARTBEAT', '15')),
 }
 
+# 分类/标签列表进程内缓存的全局版本号：为空时每次从数据库取（行数 + 最新 updated_at，一次查询），
+# 设为共享缓存别名（Redis/Memcached）时改为从缓存读取；不要设为进程内的 locmem
+TAXONOMY_CACHE_ALIAS = os.environ.get('TAXONOMY_CACHE_ALIAS', '')
+# 从数据库取得的版本号在进程内复用的秒数（其他进程的写入最多延迟这么久可见），0 表示每次都查询
+TAXONOMY_VERSION_TTL = float(os.environ.get('TAXONOMY_VERSION_TTL', '1'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -152,8 +218,11 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 SITE_ID = 1
 
 # dj-rest-auth配置
+# AUTH_USE_JWT=true 时登录返回 simplejwt 访问/刷新令牌，按令牌无状态认证（仍按用户缓存用户行）
+USE_JWT = os.environ.get('AUTH_USE_JWT', 'false').lower() == 'true'
+
 REST_AUTH = {
-    'USE_JWT': False,
+    'USE_JWT': USE_JWT,
     'JWT_AUTH_COOKIE': None,
     'JWT_AUTH_REFRESH_COOKIE': None,
     'JWT_AUTH_HTTPONLY': False,
@@ -161,6 +230,36 @@ REST_AUTH = {
     'REGISTER_SERIALIZER': 'myblog.serializers.CustomRegisterSerializer',
 }
 
+SIMPLE_JWT = {
+    'USER_ID_FIELD': 'Userid',
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.environ.get('JWT_ACCESS_MINUTES', '15'))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.environ.get('JWT_REFRESH_DAYS', '7'))),
+}
+
+# 令牌/JWT 认证的进程内用户缓存：登出、改密码、保存用户时失效，其他进程最多延迟 TTL 秒
+AUTH_CACHE = {
+    'MAX_ENTRIES': int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', '10000')),
+    'TTL': int(os.environ.get('AUTH_CACHE_TTL', '60')),
+}
+
+# 评论发布与注册的令牌桶限流：locmem 为进程内，多进程部署用 django（共享缓存）；
+# ADAPTIVE 开启时写入耗时的滑动平均超过 TARGET_LATENCY_MS 会按比例收紧速率
+THROTTLE = {
+    'ENABLED': os.environ.get('THROTTLE_ENABLED', 'true').lower() == 'true',
+    'BACKEND': os.environ.get('THROTTLE_BACKEND', 'locmem'),
+    'CACHE_ALIAS': os.environ.get('THROTTLE_CACHE_ALIAS', 'default'),
+    'RATES': {
+        'comment': os.environ.get('THROTTLE_COMMENT_RATE', '10/min'),
+        'registration': os.environ.get('THROTTLE_REGISTRATION_RATE', '5/hour'),
+    },
+    'BURST': {
+        'comment': int(os.environ.get('THROTTLE_COMMENT_BURST', '5')),
+        'registration': int(os.environ.get('THROTTLE_REGISTRATION_BURST', '3')),
+    },
+    'ADAPTIVE': os.environ.get('THROTTLE_ADAPTIVE', 'false').lower() == 'true',
+    'TARGET_LATENCY_MS': int(os.environ.get('THROTTLE_TARGET_LATENCY_MS', '100')),
+}
+
 # allauth配置
 ACCOUNT_AUTHENTICATION_METHOD = 'username_email'
 ACCOUNT_SIGNUP_FIELDS = ['username', 'email']
@@ -170,13 +269,31 @@ ACCOUNT_EMAIL_VERIFICATION = 'optional'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'myblog.authentication.CachedJWTAuthentication' if USE_JWT else 'myblog.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # orjson 可用时加速 JSON 编码，否则退回标准库
+    'DEFAULT_RENDERER_CLASSES': [
+        'myblog.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # 限流按客户端 IP 计数：0 表示直接使用 REMOTE_ADDR；部署在反向代理后时设为代理层数，
+    # 从 X-Forwarded-For 右侧取真实 IP。不设置时 DRF 会信任整个 X-Forwarded-For，可被伪造绕过限流
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '0')),
 }
 
+# 安装了 msgpack 时，为自有客户端提供 application/msgpack 内容协商
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(1, 'myblog.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('myblog.renderers.MessagePackParser')
+
 # 自定义用户模型
 AUTH_USER_MODEL = 'myblog.User'
@@ -20,11 +20,17 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from myblog.feeds import sitemap_index_view, sitemap_shard_view
+from myblog.views import ThrottledRegisterView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('api/auth/', include('dj_rest_auth.urls')),
+    path('api/auth/registration/', ThrottledRegisterView.as_view(), name='rest_register'),
     path('api/auth/registration/', include('dj_rest_auth.registration.urls')),
     path('api/', include('myblog.urls')),
+    path('sitemap.xml', sitemap_index_view, name='sitemap-index'),
+    path('sitemaps/posts-<int:shard>.xml', sitemap_shard_view, name='sitemap-shard'),
 ]
 
 if settings.DEBUG:
@@ -1,7 +1,43 @@
 from django.contrib import admin
+from django.utils import timezone
+from . import archive, comment_stream, feeds, response_cache
 from .models import Blogpost, Classification, Tag, Comment, StoragePreference
 
 
+def _invalidate_posts(queryset):
+    # queryset.update() bypasses the model signals that normally invalidate caches.
+    response_cache.invalidate_tags('posts', *response_cache.post_tags(*queryset.values_list('pk', flat=True)))
+
+
+def _update_published_state(queryset, **fields):
+    # Same for archive stats: diff the buckets around the bulk update.
+    pks = list(queryset.values_list('pk', flat=True))
+    before = archive.collect(pks)
+    # update() skips auto_now, which the post ETags rely on.
+    queryset.update(updated_at=timezone.now(), **fields)
+    archive.apply_change(before, archive.collect(pks))
+    feeds.invalidate_posts(pks)
+
+
+def _invalidate_comments(queryset):
+    post_pks = set(queryset.values_list('Comment_blog_id', flat=True))
+    response_cache.invalidate_tags(*response_cache.comment_tags(*post_pks))
+
+
+def _update_comments(queryset, **fields):
+    # update() skips auto_now, which the comment ETags rely on.
+    queryset.update(updated_at=timezone.now(), **fields)
+    _invalidate_comments(queryset)
+
+
+def _update_comments_and_stream(queryset, **fields):
+    # update() also skips the post_save handler feeding the comment SSE streams.
+    hidden = [c.pk for c in queryset.only('Comment_status', 'Comment_banned') if not comment_stream.is_streamable(c)]
+    _update_comments(queryset, **fields)
+    for comment in Comment.all_objects.filter(pk__in=hidden).select_related('Comment_user'):
+        comment_stream.publish_comment(comment)
+
+
 class CommentInline(admin.TabularInline):
     model = Comment
     extra = 0
@@ -22,19 +58,23 @@ class BlogpostAdmin(admin.ModelAdmin):
     inlines = [CommentInline]
 
     def publish(self, request, queryset):
-        queryset.update(Blog_status=1)
+        _update_published_state(queryset, Blog_status=1)
+        _invalidate_posts(queryset)
     publish.short_description = "批量发布"
 
     def unpublish(self, request, queryset):
-        queryset.update(Blog_status=0)
+        _update_published_state(queryset, Blog_status=0)
+        _invalidate_posts(queryset)
     unpublish.short_description = "批量下线"
 
     def pin(self, request, queryset):
-        queryset.update(is_pinned=True)
+        queryset.update(is_pinned=True, updated_at=timezone.now())
+        _invalidate_posts(queryset)
     pin.short_description = "批量置顶"
 
     def unpin(self, request, queryset):
-        queryset.update(is_pinned=False)
+        queryset.update(is_pinned=False, updated_at=timezone.now())
+        _invalidate_posts(queryset)
     unpin.short_description = "批量取消置顶"
 
     def rebuild_slug(self, request, queryset):
@@ -70,19 +110,19 @@ class CommentAdmin(admin.ModelAdmin):
         return base_qs.select_related('Comment_user', 'Comment_blog').prefetch_related('replies')
 
     def ban_comments(self, request, queryset):
-        queryset.update(Comment_banned=True)
+        _update_comments(queryset, Comment_banned=True)
     ban_comments.short_description = "批量封禁"
 
     def unban_comments(self, request, queryset):
-        queryset.update(Comment_banned=False)
+        _update_comments_and_stream(queryset, Comment_banned=False)
     unban_comments.short_description = "取消封禁"
 
     def approve_comments(self, request, queryset):
-        queryset.update(Comment_status=1)
+        _update_comments_and_stream(queryset, Comment_status=1)
     approve_comments.short_description = "审核通过"
 
     def retract_comments(self, request, queryset):
-        queryset.update(Comment_status=0)
+        _update_comments(queryset, Comment_status=0)
     retract_comments.short_description = "撤回/草稿"
 
 
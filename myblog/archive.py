@@ -0,0 +1,146 @@
+"""
+Archive sidebar statistics (published posts per year, month, classification,
+tag and author), kept in the ``ArchiveStat`` table.
+
+The Blogpost signal handlers in ``models.py`` compute the buckets a post
+counts towards before and after each change and apply only the difference,
+so ``/api/archive/`` is a single table scan instead of several ``GROUP BY``
+queries. ``rebuild_archive_stats`` recomputes the table from scratch.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth, TruncYear
+from django.utils import timezone
+
+PUBLISHED = {'Blog_status': 1, 'Vissible': True}
+YEAR, MONTH, CLASSIFICATION, TAG, AUTHOR = 'year', 'month', 'classification', 'tag', 'author'
+
+
+def is_published(post):
+    return post.Blog_status == 1 and post.Vissible
+
+
+def _date_keys(created_at):
+    local = timezone.localtime(created_at) if timezone.is_aware(created_at) else created_at
+    return (YEAR, f'{local.year:04d}'), (MONTH, f'{local.year:04d}-{local.month:02d}')
+
+
+def buckets(post, tag_names=()) -> Counter:
+    """Buckets a post instance counts towards; empty unless it is published."""
+    if not is_published(post):
+        return Counter()
+    keys = [*_date_keys(post.created_at)]
+    if post.classification_id:
+        keys.append((CLASSIFICATION, post.classification_id))
+    if post.author_id:
+        keys.append((AUTHOR, str(post.author_id)))
+    keys.extend((TAG, name) for name in tag_names)
+    return Counter(keys)
+
+
+def collect(post_pks) -> Counter:
+    """Buckets for a set of posts, read with two narrow queries."""
+    from .models import Blogpost
+
+    if not post_pks:
+        return Counter()
+    rows = list(
+        Blogpost.objects.filter(pk__in=post_pks, **PUBLISHED).order_by()
+        .values_list('pk', 'created_at', 'classification_id', 'author_id')
+    )
+    counts = Counter()
+    for _, created_at, classification, author in rows:
+        counts.update(_date_keys(created_at))
+        if classification:
+            counts[(CLASSIFICATION, classification)] += 1
+        if author:
+            counts[(AUTHOR, str(author))] += 1
+    tag_rows = Blogpost.tags.through.objects.filter(blogpost_id__in=[row[0] for row in rows]).values_list('tag_id', flat=True)
+    counts.update((TAG, name) for name in tag_rows)
+    return counts
+
+
+def apply(deltas):
+    """Add ``{(dimension, key): delta}`` to the stored counts."""
+    from .models import ArchiveStat
+
+    deltas = {bucket: delta for bucket, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        for (dimension, key), delta in deltas.items():
+            if _increment(dimension, key, delta) or delta <= 0:
+                continue
+            try:
+                with transaction.atomic():
+                    ArchiveStat.objects.create(dimension=dimension, key=key, count=delta)
+            except IntegrityError:
+                # Another writer created the bucket since the update; add to it instead.
+                _increment(dimension, key, delta)
+        ArchiveStat.objects.filter(count__lte=0).delete()
+
+
+def _increment(dimension, key, delta) -> int:
+    from .models import ArchiveStat
+
+    return ArchiveStat.objects.filter(dimension=dimension, key=key).update(count=F('count') + delta)
+
+
+def apply_change(before, after):
+    deltas = Counter(after)
+    deltas.subtract(before)
+    apply(deltas)
+
+
+def rebuild():
+    """Recompute every bucket from the posts table."""
+    from .models import ArchiveStat, Blogpost
+
+    published = Blogpost.objects.filter(**PUBLISHED).order_by()
+    rows = []
+    for trunc, dimension, fmt in ((TruncYear, YEAR, '%Y'), (TruncMonth, MONTH, '%Y-%m')):
+        for period, n in published.annotate(period=trunc('created_at')).values('period').annotate(n=Count('pk')).values_list('period', 'n'):
+            rows.append(ArchiveStat(dimension=dimension, key=period.strftime(fmt), count=n))
+    for dimension, field in ((CLASSIFICATION, 'classification_id'), (AUTHOR, 'author_id')):
+        for value, n in published.exclude(**{field: None}).values(field).annotate(n=Count('pk')).values_list(field, 'n'):
+            rows.append(ArchiveStat(dimension=dimension, key=str(value), count=n))
+    tag_counts = (
+        Blogpost.tags.through.objects.filter(blogpost__in=published).order_by()
+        .values('tag_id').annotate(n=Count('pk')).values_list('tag_id', 'n')
+    )
+    rows.extend(ArchiveStat(dimension=TAG, key=name, count=n) for name, n in tag_counts)
+    with transaction.atomic():
+        ArchiveStat.objects.all().delete()
+        ArchiveStat.objects.bulk_create(rows)
+    return len(rows)
+
+
+def _by_count(item):
+    return -item[1], item[0]
+
+
+def get_archive() -> dict:
+    """Sidebar payload for ``/api/archive/``."""
+    from .models import ArchiveStat, User
+
+    grouped = {YEAR: [], MONTH: [], CLASSIFICATION: [], TAG: [], AUTHOR: []}
+    for dimension, key, count in ArchiveStat.objects.filter(count__gt=0).values_list('dimension', 'key', 'count'):
+        grouped[dimension].append((key, count))
+
+    authors = grouped[AUTHOR]
+    usernames = dict(User.objects.filter(pk__in=[key for key, _ in authors]).values_list('pk', 'username'))
+    return {
+        'years': [{'year': int(key), 'count': n} for key, n in sorted(grouped[YEAR], reverse=True)],
+        'months': [
+            {'year': int(key[:4]), 'month': int(key[5:]), 'count': n}
+            for key, n in sorted(grouped[MONTH], reverse=True)
+        ],
+        'classifications': [{'name': key, 'count': n} for key, n in sorted(grouped[CLASSIFICATION], key=_by_count)],
+        'tags': [{'name': key, 'count': n} for key, n in sorted(grouped[TAG], key=_by_count)],
+        'authors': [
+            {'Userid': int(key), 'username': usernames.get(int(key), ''), 'count': n}
+            for key, n in sorted(authors, key=_by_count)
+        ],
+    }
@@ -0,0 +1,321 @@
+"""
+Native async versions of the hot read endpoints for ASGI deployments.
+
+With ``ASYNC_READ_VIEWS`` enabled, ``myblog/urls.py`` puts these in front of
+the router routes for the post list/detail, comment tree and tag/
+classification endpoints. They serve anonymous JSON GET/HEAD requests on the
+async ORM, without hopping into a worker thread; anything else (writes,
+authenticated users, the browsable API, MessagePack, pagination, 404s) is
+handed to the DRF view the route belongs to.
+
+Payloads, ETags and response-cache entries are the same as the DRF views':
+querysets and serializer contexts come from the viewsets, rows are built by
+the ``a*`` functions in ``fast_serializers`` and cache keys/tags are shared,
+so both paths fill and hit the same entries. Markdown is rendered in the
+default executor.
+
+``post_comment_stream`` is the Server-Sent Events stream of newly approved
+comments fed by ``comment_stream``. It only streams under the ASGI app, where
+an open stream does not hold a worker thread; under WSGI Django would buffer
+the endless generator, so it answers 501 there.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import re_path
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.request import Request
+
+from . import comment_stream, fast_serializers, response_cache, taxonomy_cache
+from .conditional import acomment_aggregates, apost_aggregates, make_etag, media_fingerprint, taxonomy_fingerprint
+from .db_router import replica_reads
+from .models import Blogpost, Comment
+from .renderers import FastJSONRenderer
+from .response_cache import comment_tags
+from .views import (
+    BlogpostViewSet,
+    ClassificationViewSet,
+    TagViewSet,
+    _comment_cache_tags,
+    _post_cache_tags,
+    _split_sideloaded,
+)
+
+MEDIA_TYPE = 'application/json'
+
+_renderer = FastJSONRenderer()
+
+
+def is_async_servable(request) -> bool:
+    """Anonymous plain-JSON reads; the DRF views handle everything else."""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if 'Authorization' in request.headers or settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return False
+    accept = request.headers.get('Accept', '')
+    return 'format' not in request.GET and not any(part in accept for part in ('text/html', 'msgpack', 'indent'))
+
+
+def _viewset(viewset_class, request, action, **kwargs):
+    """A viewset instance used only for its queryset and serializer context."""
+    drf_request = Request(request)
+    drf_request.accepted_media_type = MEDIA_TYPE
+    return viewset_class(request=drf_request, action=action, args=(), kwargs=kwargs, format_kwarg=None)
+
+
+def _json_response(data, etag=None, timestamp=None):
+    response = HttpResponse(_renderer.render(data, MEDIA_TYPE, {}), content_type=MEDIA_TYPE)
+    response['Vary'] = 'Accept'
+    if etag:
+        response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def _validators(request, parts, last_modified=None):
+    """Same validators as ``ConditionalGetMixin``: ``(etag, timestamp, 304 response or None)``."""
+    etag = make_etag(request.get_full_path(), MEDIA_TYPE, parts)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return etag, timestamp, get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+async def _serve_cached(request, view, base_tags, compute, cache_tags):
+    """
+    ``ResponseCacheMixin.serve_cached`` for async handlers. ``compute()``
+    returns ``(response, data)``, or None to fall back to the DRF view.
+    ``base_tags`` is a set or a coroutine function only awaited on a miss.
+    Misses are not coalesced; concurrent misses compute in parallel.
+    """
+    if not response_cache.get_config()['ENABLED']:
+        result = await compute()
+        return result and result[0]
+    key = response_cache.build_key(view.request)
+    entry = await sync_to_async(response_cache.get_entry)(key)
+    if entry is not None and entry['fresh_until'] > time.time():
+        response_cache.record('hits')
+        return response_cache.entry_to_response(request, entry)
+    response_cache.record('refreshes' if entry is not None else 'misses')
+    # Snapshot versions before computing so a concurrent invalidation wins;
+    # fill from the primary, as the DRF views do.
+    started = time.time()
+    with replica_reads(False):
+        if callable(base_tags):
+            base_tags = await base_tags()
+        versions = await sync_to_async(response_cache.tag_versions)(base_tags)
+        result = await compute()
+    if result is None:
+        return None
+    response, data = result
+    if response.status_code == 200 and data is not None:
+        versions = await sync_to_async(response_cache.fill_versions)(versions, started, cache_tags(data))
+        if versions is not None:
+            await sync_to_async(response_cache.store_entry)(key, response, versions)
+        response['X-Cache'] = 'MISS'
+    return response
+
+
+async def _with_sideloaded_users(data, context):
+    user_ids = context.get('sideloaded_user_ids')
+    if user_ids is None:
+        return data
+    users = await fast_serializers.aserialize_users(user_ids, {'request': context['request']})
+    return {'results': data, 'users': users}
+
+
+async def post_list(request):
+    view = _viewset(BlogpostViewSet, request, 'list')
+    if view.paginator is not None:
+        return None
+    queryset = view.filter_queryset(view.get_queryset())
+    context = view.get_serializer_context()
+
+    async def compute():
+        agg = await apost_aggregates(view.get_queryset())
+        etag, timestamp, not_modified = _validators(
+            request, (agg, await sync_to_async(taxonomy_fingerprint)(), await sync_to_async(media_fingerprint)()),
+        )
+        if not_modified:
+            return not_modified, None
+        data = await _with_sideloaded_users(await fast_serializers.aserialize_posts(queryset, context), context)
+        return _json_response(data, etag, timestamp), data
+
+    def cache_tags(data):
+        rows, tags = _split_sideloaded(data)
+        return tags.union(*(_post_cache_tags(post) for post in rows))
+
+    return await _serve_cached(request, view, {'posts'}, compute, cache_tags)
+
+
+async def post_detail(request, slug):
+    view = _viewset(BlogpostViewSet, request, 'retrieve', slug=slug)
+    queryset = view.get_queryset().filter(**view._lookup_filter())
+
+    async def compute():
+        agg = await apost_aggregates(queryset)
+        if not agg['count']:
+            return None
+        last_modified = max(filter(None, [agg['last'], agg['author_last']]))
+        etag, timestamp, not_modified = _validators(
+            request, (agg, await sync_to_async(taxonomy_fingerprint)(), await sync_to_async(media_fingerprint)()),
+            last_modified,
+        )
+        if not_modified:
+            return not_modified, None
+        rows = await fast_serializers.aserialize_posts(queryset, view.get_serializer_context())
+        if not rows:
+            return None
+        return _json_response(rows[0], etag, timestamp), rows[0]
+
+    async def base_tags():
+        pk = await queryset.values_list('pk', flat=True).afirst()
+        return set(response_cache.post_tags(pk)) if pk else set()
+
+    return await _serve_cached(request, view, base_tags, compute, _post_cache_tags)
+
+
+async def post_comments(request, slug):
+    view = _viewset(BlogpostViewSet, request, 'comments', slug=slug)
+    post_pk = await view.get_queryset().filter(**view._lookup_filter()).values_list('pk', flat=True).afirst()
+    if post_pk is None:
+        return None
+    try:
+        max_depth = int(request.GET.get('depth', 2))
+    except ValueError:
+        max_depth = 2
+    context = {**view.get_serializer_context(), 'max_depth': max_depth, 'current_depth': 1}
+
+    async def compute():
+        agg = await acomment_aggregates(Comment.objects.filter(Comment_blog_id=post_pk))
+        etag, timestamp, not_modified = _validators(request, agg)
+        if not_modified:
+            return not_modified, None
+        top = Comment.objects.filter(Comment_blog_id=post_pk, Comment_parent__isnull=True)
+        data = await _with_sideloaded_users(await fast_serializers.aserialize_comments(top, context), context)
+        return _json_response(data, etag, timestamp), data
+
+    def cache_tags(data):
+        rows, tags = _split_sideloaded(data)
+        return tags | _comment_cache_tags(rows)
+
+    return await _serve_cached(request, view, set(comment_tags(post_pk)), compute, cache_tags)
+
+
+def _taxonomy_views(viewset_class):
+    model, serializer_class = viewset_class.queryset.model, viewset_class.serializer_class
+
+    async def respond(request, pick):
+        etag, _, not_modified = _validators(request, await sync_to_async(taxonomy_fingerprint)())
+        if not_modified:
+            return not_modified
+        rows, by_pk = await sync_to_async(taxonomy_cache.get_lists)(model, serializer_class)
+        data = pick(rows, by_pk)
+        return None if data is None else _json_response(data, etag)
+
+    async def taxonomy_list(request):
+        return await respond(request, lambda rows, by_pk: rows)
+
+    async def taxonomy_detail(request, pk):
+        return await respond(request, lambda rows, by_pk: by_pk.get(pk))
+
+    return taxonomy_list, taxonomy_detail
+
+
+tag_list, tag_detail = _taxonomy_views(TagViewSet)
+classification_list, classification_detail = _taxonomy_views(ClassificationViewSet)
+
+HANDLERS = {
+    'post-list': post_list,
+    'post-detail': post_detail,
+    'post-comments': post_comments,
+    'tag-list': tag_list,
+    'tag-detail': tag_detail,
+    'classification-list': classification_list,
+    'classification-detail': classification_detail,
+}
+
+
+def read_view(handler, fallback):
+    """Serve with ``handler`` when possible, otherwise (or when it returns None) with ``fallback``."""
+    fallback = sync_to_async(fallback)
+
+    async def view(request, *args, **kwargs):
+        if is_async_servable(request):
+            with replica_reads():
+                response = await handler(request, **kwargs)
+            if response is not None:
+                return response
+        return await fallback(request, *args, **kwargs)
+
+    # DRF enforces CSRF itself for session-authenticated writes.
+    return csrf_exempt(view)
+
+
+def async_read_urls(router_urls):
+    """Async routes for the ``HANDLERS`` entries of ``router.urls``, to be placed before them."""
+    return [
+        re_path(str(url.pattern), read_view(HANDLERS[url.name], url.callback), name=url.name)
+        for url in router_urls
+        if url.name in HANDLERS and 'format' not in url.pattern.regex.groupindex
+    ]
+
+
+async def _comment_events(post_pk, after):
+    config = comment_stream.get_config()
+    backend = comment_stream.get_backend()
+    channel = comment_stream.channel_for(post_pk)
+    # Subscribe before reading the history so nothing slips in between.
+    subscription = backend.subscribe(channel)
+    try:
+        yield f"retry: {config['RETRY_MS']}\n\n".encode()
+        if after is None:
+            after = await sync_to_async(backend.last_id)(channel)
+            yield comment_stream.format_event('{}', 'ready', after)
+            missed = []
+        else:
+            last_id = await sync_to_async(backend.last_id)(channel)
+            if after > last_id:
+                # An id this channel never issued (restart, or another worker's
+                # locmem channel): reload, then count from the current sequence.
+                yield comment_stream.format_event('{}', 'reset')
+                after, missed = last_id, []
+            else:
+                missed, complete = await sync_to_async(backend.since)(channel, after)
+                if not complete:
+                    # Too far behind: the client reloads the comment tree.
+                    yield comment_stream.format_event('{}', 'reset')
+        while True:
+            for seq, data in missed:
+                if seq > after:
+                    yield comment_stream.format_event(_renderer.render(data, MEDIA_TYPE, {}), 'comment', seq)
+                    after = seq
+            missed = await subscription.next(after, config['HEARTBEAT'])
+            if not missed:
+                yield b': keep-alive\n\n'
+    finally:
+        subscription.close()
+
+
+async def post_comment_stream(request, slug):
+    """``text/event-stream`` of ``comment`` events; resumes after ``Last-Event-ID``."""
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse('评论实时推送仅在 ASGI 部署下可用', status=501, content_type='text/plain; charset=utf-8')
+    lookup = {'pk': slug} if slug.isdigit() else {'slug': slug}
+    post_pk = await Blogpost.objects.filter(**lookup).values_list('pk', flat=True).afirst()
+    if post_pk is None:
+        raise Http404
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        after = int(last_event_id) if last_event_id else None
+    except ValueError:
+        after = None
+    response = StreamingHttpResponse(_comment_events(post_pk, after), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies (nginx) from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,109 @@
+"""
+Authentication classes that keep the per-request user lookup in memory.
+
+``CachedTokenAuthentication`` replaces DRF's ``TokenAuthentication``, which
+joins ``Token`` and ``User`` on every authenticated request. Lookups are kept
+in a bounded LRU (``AUTH_CACHE['MAX_ENTRIES']``) for ``AUTH_CACHE['TTL']``
+seconds; the ``Token`` and ``User`` signal handlers in ``models.py`` drop
+entries on logout (token deletion), password change and any other user save.
+The cache is per process, so in multi-worker deployments a change made in
+another worker is seen once the TTL runs out.
+
+``CachedJWTAuthentication`` is used instead when ``REST_AUTH['USE_JWT']`` is
+on: the token itself is verified without the database and only the user row
+is looked up, through the same cache.
+"""
+import copy
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .lru import LRUCache
+
+try:
+    from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+    from rest_framework_simplejwt.settings import api_settings as jwt_settings
+    from rest_framework_simplejwt.utils import get_md5_hash_password
+except ImportError:  # pragma: no cover - optional dependency
+    JWTCookieAuthentication = None
+
+DEFAULTS = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 60,
+}
+
+_cache = None
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'AUTH_CACHE', {})}
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        config = get_config()
+        _cache = LRUCache(max_entries=config['MAX_ENTRIES'], ttl=config['TTL'])
+    return _cache
+
+
+@receiver(setting_changed)
+def _reset_cache(setting, **kwargs):
+    global _cache
+    if setting == 'AUTH_CACHE':
+        _cache = None
+
+
+def invalidate_token(key):
+    get_cache().delete(f'token:{key}')
+
+
+def invalidate_user(user):
+    cache = get_cache()
+    cache.delete(f'user:{user.pk}')
+    from rest_framework.authtoken.models import Token  # local import to avoid circular deps
+
+    for key in Token.objects.filter(user_id=user.pk).values_list('key', flat=True):
+        cache.delete(f'token:{key}')
+
+
+def _copy(user):
+    # Requests must not share (and mutate) one cached instance.
+    return copy.copy(user)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache = get_cache()
+        cached = cache.get(f'token:{key}')
+        if cached is not None:
+            user, token = cached
+            return _copy(user), token
+        user, token = super().authenticate_credentials(key)
+        cache.set(f'token:{key}', (user, token))
+        return _copy(user), token
+
+
+if JWTCookieAuthentication is not None:
+    class CachedJWTAuthentication(JWTCookieAuthentication):
+        def get_user(self, validated_token):
+            user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+            if user_id is None:
+                return super().get_user(validated_token)
+            cache = get_cache()
+            user = cache.get(f'user:{user_id}')
+            if user is None:
+                # Runs the active/revocation checks on the fresh row.
+                user = super().get_user(validated_token)
+                cache.set(f'user:{user_id}', user)
+            elif jwt_settings.CHECK_REVOKE_TOKEN and (
+                validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+            ):
+                raise exceptions.AuthenticationFailed(
+                    _("The user's password has been changed."), code='password_changed',
+                )
+            return _copy(user)
@@ -0,0 +1,209 @@
+"""
+Resumable chunked uploads for post images.
+
+Chunks are appended straight from the request stream to a part file under
+``CHUNKED_UPLOAD_DIR`` (outside ``MEDIA_ROOT``, so unfinished uploads are
+never served) and worker memory stays constant regardless of file size. The
+current offset is simply the part file's size, which is what makes
+interrupted uploads resumable. On completion the checksum is verified, the
+file is checked to be an image of an allowed type, and it is moved into its
+final ``post_image_upload_to`` path with ``os.replace`` (atomic when the
+upload directory is on the same filesystem as ``MEDIA_ROOT``).
+"""
+import errno
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image, UnidentifiedImageError
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+READ_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+SESSION_TTL = 24 * 3600
+# Extension -> Pillow format; anything a browser could run as a document
+# (.html, .svg, ...) is refused.
+IMAGE_FORMATS = {
+    'jpg': 'JPEG',
+    'jpeg': 'JPEG',
+    'png': 'PNG',
+    'gif': 'GIF',
+    'webp': 'WEBP',
+}
+CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+
+class UploadError(Exception):
+    """Raised when a chunk or completion request cannot be applied."""
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, expected):
+        super().__init__(f'offset mismatch, expected {expected}')
+        self.expected = expected
+
+
+class UploadConflict(UploadError):
+    """Another request already completed or discarded the upload."""
+
+
+def extension(filename: str) -> str:
+    return Path(filename).suffix.lstrip('.').lower()
+
+
+def content_type_for(filename: str) -> str | None:
+    """The only Content-Type accepted for ``filename``, None if it is not an allowed image."""
+    image_format = IMAGE_FORMATS.get(extension(filename))
+    return CONTENT_TYPES.get(image_format)
+
+
+def _upload_dir() -> Path:
+    path = Path(getattr(settings, 'CHUNKED_UPLOAD_DIR', None) or Path(settings.MEDIA_ROOT).parent / '.uploads')
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _paths(upload_id: str):
+    base = _upload_dir()
+    return base / f'{upload_id}.json', base / f'{upload_id}.part'
+
+
+def current_offset(upload_id: str) -> int:
+    _, part = _paths(upload_id)
+    try:
+        return part.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def create_session(post_pk: int, filename: str, size: int, sha256: str) -> dict:
+    purge_expired()
+    upload_id = uuid.uuid4().hex
+    meta = {
+        'upload_id': upload_id,
+        'post': post_pk,
+        'filename': filename,
+        'size': size,
+        'sha256': sha256.lower(),
+        'created': time.time(),
+    }
+    meta_path, part = _paths(upload_id)
+    part.touch()
+    meta_path.write_text(json.dumps(meta))
+    return meta
+
+
+def load_session(upload_id: str) -> dict | None:
+    meta_path, _ = _paths(upload_id)
+    try:
+        return json.loads(meta_path.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def append_chunk(meta: dict, offset: int, stream, length: int) -> int:
+    """
+    Append ``length`` bytes read from ``stream`` at ``offset``.
+    Returns the new offset. The offset check and the write happen under an
+    exclusive lock so two concurrent retries of a chunk cannot interleave.
+    """
+    if length > MAX_CHUNK_SIZE:
+        raise UploadError(f'chunk larger than {MAX_CHUNK_SIZE} bytes')
+    _, part = _paths(meta['upload_id'])
+    with open(part, 'ab') as fh:
+        if fcntl:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        size = os.fstat(fh.fileno()).st_size
+        if offset != size:
+            raise OffsetMismatch(size)
+        if size + length > meta['size']:
+            raise UploadError('chunk exceeds declared size')
+        remaining = length
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            fh.write(data)
+            remaining -= len(data)
+        fh.flush()
+        return os.fstat(fh.fileno()).st_size
+
+
+def _verify_image(path, ext):
+    try:
+        with Image.open(path) as img:
+            fmt = img.format
+            img.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+        return False
+    return fmt == IMAGE_FORMATS.get(ext)
+
+
+def finalize(meta: dict, relative_path: str) -> str:
+    """
+    Verify size, checksum and image type, then move the part file to
+    ``MEDIA_ROOT/relative_path``. Returns ``relative_path``.
+    """
+    meta_path, part = _paths(meta['upload_id'])
+    if current_offset(meta['upload_id']) != meta['size']:
+        raise UploadError('upload is incomplete')
+
+    digest = hashlib.sha256()
+    try:
+        with open(part, 'rb') as fh:
+            for block in iter(lambda: fh.read(READ_SIZE), b''):
+                digest.update(block)
+    except FileNotFoundError:
+        raise UploadConflict('upload already completed') from None
+    if digest.hexdigest() != meta['sha256']:
+        discard(meta['upload_id'])
+        raise UploadError('checksum mismatch')
+    if not _verify_image(part, extension(relative_path)):
+        discard(meta['upload_id'])
+        raise UploadError('not a valid image')
+
+    dest = Path(settings.MEDIA_ROOT) / relative_path
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        try:
+            os.replace(part, dest)
+        except OSError as exc:
+            if exc.errno != errno.EXDEV:
+                raise
+            shutil.move(part, dest)
+    except FileNotFoundError:
+        # A concurrent completion of the same upload moved it first.
+        raise UploadConflict('upload already completed') from None
+    meta_path.unlink(missing_ok=True)
+    return relative_path
+
+
+def discard(upload_id: str):
+    for path in _paths(upload_id):
+        path.unlink(missing_ok=True)
+
+
+def purge_expired(now: float | None = None):
+    """Drop sessions idle for longer than SESSION_TTL; called opportunistically."""
+    now = now or time.time()
+    for part in _upload_dir().glob('*.part'):
+        try:
+            idle = now - part.stat().st_mtime
+        except FileNotFoundError:
+            continue
+        if idle > SESSION_TTL:
+            discard(part.stem)
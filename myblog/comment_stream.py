@@ -0,0 +1,235 @@
+"""
+Pub/sub feeding the Server-Sent Events stream of new comments on a post.
+
+``publish_comment()`` runs after the transaction that published a comment
+commits (``Comment`` post_save, and the admin approve action, which uses
+``update()``); it serializes the comment once and appends it to the post's
+channel. Every channel numbers its events and keeps the last ``HISTORY`` of
+them, so a client reconnecting with ``Last-Event-ID`` gets only what it
+missed; if that is older than the history the stream sends ``reset`` and
+the client reloads the comment tree.
+
+Backends (``settings.COMMENT_STREAM['BACKEND']``):
+
+* ``locmem`` - in-process, subscribers are woken directly. Only sees
+  comments published by the same process.
+* ``django`` - events stored in a shared ``CACHES`` alias (Redis/Memcached)
+  and polled every ``POLL_INTERVAL`` seconds; works across processes.
+"""
+import asyncio
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+
+DEFAULTS = {
+    'BACKEND': 'locmem',
+    'CACHE_ALIAS': 'default',
+    'HISTORY': 200,
+    'HEARTBEAT': 15,
+    'POLL_INTERVAL': 1.0,
+    'RETRY_MS': 3000,
+}
+KEY_PREFIX = 'cs:'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'COMMENT_STREAM', {})}
+
+
+def channel_for(post_pk) -> str:
+    return f'post:{post_pk}'
+
+
+class LocMemBackend:
+    def __init__(self, config):
+        self._history_size = config['HISTORY']
+        self._lock = threading.Lock()
+        self._channels = {}
+
+    def _channel(self, channel):
+        state = self._channels.get(channel)
+        if state is None:
+            state = self._channels[channel] = {
+                'seq': 0, 'history': deque(maxlen=self._history_size), 'subscribers': set(),
+            }
+        return state
+
+    def publish(self, channel, data) -> int:
+        with self._lock:
+            state = self._channel(channel)
+            state['seq'] += 1
+            event = (state['seq'], data)
+            state['history'].append(event)
+            subscribers = list(state['subscribers'])
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:  # loop already closed
+                pass
+        return event[0]
+
+    def last_id(self, channel) -> int:
+        with self._lock:
+            return self._channel(channel)['seq']
+
+    def since(self, channel, after):
+        """
+        ``(events after ``after``, complete)``; incomplete when history no
+        longer reaches back or ``after`` is ahead of the channel.
+        """
+        with self._lock:
+            state = self._channel(channel)
+            history = list(state['history'])
+            seq = state['seq']
+        if after >= seq:
+            return [], after == seq
+        events = [event for event in history if event[0] > after]
+        return events, bool(events) and events[0][0] == after + 1
+
+    def subscribe(self, channel):
+        return LocMemSubscription(self, channel)
+
+
+class LocMemSubscription:
+    def __init__(self, backend, channel):
+        self._backend = backend
+        self._channel = channel
+        self._queue = asyncio.Queue()
+        self._key = (asyncio.get_running_loop(), self._queue)
+        with backend._lock:
+            backend._channel(channel)['subscribers'].add(self._key)
+
+    async def next(self, after, timeout):
+        """Events with a sequence above ``after``, or ``[]`` after ``timeout`` seconds."""
+        try:
+            event = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        events = [event]
+        while not self._queue.empty():
+            events.append(self._queue.get_nowait())
+        return [event for event in events if event[0] > after]
+
+    def close(self):
+        with self._backend._lock:
+            self._backend._channel(self._channel)['subscribers'].discard(self._key)
+
+
+class DjangoCacheBackend:
+    """Events under ``cs:<channel>:<seq>`` plus a ``cs:<channel>:seq`` counter in a shared cache."""
+
+    def __init__(self, config):
+        self._cache = caches[config['CACHE_ALIAS']]
+        self._history_size = config['HISTORY']
+        self._poll_interval = config['POLL_INTERVAL']
+
+    def _seq_key(self, channel):
+        return f'{KEY_PREFIX}{channel}:seq'
+
+    def publish(self, channel, data) -> int:
+        self._cache.add(self._seq_key(channel), 0, None)
+        seq = self._cache.incr(self._seq_key(channel))
+        # Old events expire by count: each new one pushes the oldest out.
+        self._cache.set(f'{KEY_PREFIX}{channel}:{seq}', data, None)
+        self._cache.delete(f'{KEY_PREFIX}{channel}:{seq - self._history_size}')
+        return seq
+
+    def last_id(self, channel) -> int:
+        return self._cache.get(self._seq_key(channel)) or 0
+
+    def since(self, channel, after):
+        seq = self.last_id(channel)
+        if after >= seq:
+            return [], after == seq
+        first = max(after + 1, seq - self._history_size + 1)
+        keys = {f'{KEY_PREFIX}{channel}:{n}': n for n in range(first, seq + 1)}
+        found = self._cache.get_many(list(keys))
+        events = []
+        for key, n in keys.items():
+            if key not in found:
+                # Counter bumped but event not stored yet; pick it up on the next poll.
+                break
+            events.append((n, found[key]))
+        complete = first == after + 1 and (not events or events[0][0] == after + 1)
+        return events, complete
+
+    def subscribe(self, channel):
+        return PollingSubscription(self, channel)
+
+
+class PollingSubscription:
+    def __init__(self, backend, channel):
+        self._backend = backend
+        self._channel = channel
+
+    async def next(self, after, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            events, _ = await asyncio.to_thread(self._backend.since, self._channel, after)
+            if events:
+                return events
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return []
+            await asyncio.sleep(min(self._backend._poll_interval, remaining))
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    'locmem': LocMemBackend,
+    'django': DjangoCacheBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        config = get_config()
+        _backend = BACKENDS[config['BACKEND']](config)
+    return _backend
+
+
+@receiver(setting_changed)
+def _reset_backend(setting, **kwargs):
+    global _backend
+    if setting in ('COMMENT_STREAM', 'CACHES'):
+        _backend = None
+
+
+def is_streamable(comment) -> bool:
+    """Only approved, unbanned comments are pushed."""
+    return comment.Comment_status == 1 and not comment.Comment_banned
+
+
+def _publish_now(comment):
+    from .serializers import CommentSerializer  # local import to avoid circular deps
+
+    data = dict(CommentSerializer(comment, context={'max_depth': 1}).data)
+    get_backend().publish(channel_for(comment.Comment_blog_id), data)
+
+
+def publish_comment(comment):
+    """Push ``comment`` to its post's stream once the current transaction commits."""
+    if is_streamable(comment):
+        transaction.on_commit(lambda: _publish_now(comment))
+
+
+def format_event(data: bytes | str, event=None, event_id=None) -> bytes:
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    text = data.decode() if isinstance(data, bytes) else data
+    lines.extend(f'data: {line}' for line in text.splitlines() or [''])
+    return ('\n'.join(lines) + '\n\n').encode()
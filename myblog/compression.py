@@ -0,0 +1,101 @@
+"""
+Precompressed response bodies.
+
+Bodies are compressed once when a cache entry is filled and the stored
+variant matching ``Accept-Encoding`` is sent as is, so identical payloads are
+not recompressed per request. Brotli is used when the optional ``brotli``
+package is installed. Thresholds and levels come from ``settings.COMPRESSION``;
+``in_background()`` runs fills on a single worker thread so the request that
+filled the cache does not wait for compression.
+"""
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+DEFAULTS = {
+    'MIN_SIZE': 512,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    'BACKGROUND': True,
+}
+
+_executor = None
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'COMPRESSION', {})}
+
+
+def compress_variants(body: bytes) -> dict:
+    """``{'identity': body, 'gzip': ..., 'br': ...}``; small bodies stay uncompressed."""
+    config = get_config()
+    variants = {'identity': body}
+    if len(body) < config['MIN_SIZE']:
+        return variants
+    variants['gzip'] = gzip.compress(body, compresslevel=config['GZIP_LEVEL'], mtime=0)
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=config['BROTLI_QUALITY'])
+    return variants
+
+
+def in_background(fn, *args):
+    """Run ``fn(*args)`` on the compression thread, or inline when disabled."""
+    global _executor
+    if not get_config()['BACKGROUND']:
+        fn(*args)
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='precompress')
+    _executor.submit(fn, *args)
+
+
+def weaken_etag(etag):
+    """Encoded bodies differ byte-wise, so they only carry a weak validator."""
+    return etag if not etag or etag.startswith('W/') else 'W/' + etag
+
+
+def negotiate(accept_encoding: str, available) -> str:
+    """Pick the best stored encoding the client accepts (br > gzip > identity)."""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.lower()] = q
+    for coding in ('br', 'gzip'):
+        if coding in available and accepted.get(coding, accepted.get('*', 0)) > 0:
+            return coding
+    return 'identity'
+
+
+def precompressed_response(request, variants, content_type, etag=None, last_modified=None):
+    """
+    Serve the best variant, answering conditional requests with 304.
+    ``last_modified`` is a POSIX timestamp.
+    """
+    encoding = negotiate(request.headers.get('Accept-Encoding', ''), variants)
+    response = HttpResponse(variants[encoding], content_type=content_type)
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+        etag = weaken_etag(etag)
+    if len(variants) > 1:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    if etag:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response) or response
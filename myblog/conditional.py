@@ -0,0 +1,113 @@
+"""
+Conditional GET support (ETag / Last-Modified) for the read API.
+
+Validators are computed from cheap aggregates (max timestamps, counts) before
+any row is loaded or serialized; a matching ``If-None-Match`` or
+``If-Modified-Since`` short-circuits the request with 304.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import media_urls, taxonomy_cache
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return quote_etag(digest)
+
+
+def taxonomy_fingerprint():
+    """
+    Fingerprint of tag/classification rows, which are nested in post payloads:
+    the global taxonomy version, checked without touching the database.
+    """
+    return taxonomy_cache.get_version()
+
+
+def media_fingerprint():
+    """
+    Fingerprint of image rows and the CDN setting, which the rewritten
+    ``content_html`` depends on; any post may embed any image.
+    """
+    return media_urls.get_version()
+
+
+def _post_aggregates():
+    return {
+        'count': Count('pk'),
+        'last': Max('updated_at'),
+        'author_last': Max('author__updated_at'),
+        'tags': Count('tags'),
+    }
+
+
+def _comment_aggregates():
+    return {
+        'count': Count('pk'),
+        'last': Max('Comment_time'),
+        'last_id': Max('Comment_id'),
+        # Edits and moderation (status/banned) only move updated_at.
+        'changed': Max('updated_at'),
+        'user_last': Max('Comment_user__updated_at'),
+    }
+
+
+def post_aggregates(qs):
+    return qs.order_by().aggregate(**_post_aggregates())
+
+
+async def apost_aggregates(qs):
+    return await qs.order_by().aaggregate(**_post_aggregates())
+
+
+def comment_aggregates(qs):
+    return qs.order_by().aggregate(**_comment_aggregates())
+
+
+async def acomment_aggregates(qs):
+    return await qs.order_by().aaggregate(**_comment_aggregates())
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin answering conditional GETs before serialization.
+    Subclasses implement ``get_validators()`` returning ``(etag_parts, last_modified)``
+    or ``None`` to skip the check. ``Last-Modified`` should only be returned when
+    it changes on every modification (i.e. not for lists, where deletions do not
+    move the max timestamp).
+    """
+
+    def get_validators(self, request):
+        return None
+
+    def check_not_modified(self, request):
+        self._validators = None
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        validators = self.get_validators(request)
+        if validators is None:
+            return None
+        parts, last_modified = validators
+        etag = make_etag(request.get_full_path(), request.accepted_media_type, parts)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        self._validators = (etag, timestamp)
+        return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, '_validators', None)
+        if validators and response.status_code == 200:
+            etag, timestamp = validators
+            response.headers.setdefault('ETag', etag)
+            if timestamp is not None:
+                response.headers.setdefault('Last-Modified', http_date(timestamp))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.check_not_modified(request) or super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.check_not_modified(request) or super().retrieve(request, *args, **kwargs)
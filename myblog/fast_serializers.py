@@ -0,0 +1,261 @@
+"""
+Read-only fast path for list payloads.
+
+Projects ``values()`` rows straight into the dicts the ModelSerializers in
+``serializers.py`` produce, skipping per-row serializer instantiation and
+field introspection. Field order and formatting (datetimes, file URLs,
+nested users/taxonomies) must stay identical to the DRF output; the tests
+compare both paths. Anything that writes still goes through the regular
+serializers. Nested tags/classifications reuse the dicts held by
+``taxonomy_cache``, which also backs the taxonomy endpoints. The ``a*``
+variants read through the async ORM for the views in ``async_views``.
+"""
+import asyncio
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from rest_framework import serializers
+
+from . import taxonomy_cache
+from .media_urls import get_media_url_map
+from .models import Blogpost, Classification, Comment, Tag, User
+from .serializers import POST_READ_FIELDS, ClassificationSerializer, TagSerializer, render_markdown_safe
+
+USER_FIELDS = ('Userid', 'username', 'email', 'signature', 'avatar', 'created_at', 'updated_at')
+# Column read for each BlogpostSerializer field whose name differs.
+POST_COLUMNS = {'author': 'author_id', 'classification': 'classification_id', 'content_html': 'Content'}
+COMMENT_FIELDS = (
+    'Comment_id', 'Comment_time', 'Comment_content', 'Comment_status', 'Comment_banned',
+    'Comment_user_id', 'Comment_blog_id', 'Comment_parent_id',
+)
+
+_datetime = serializers.DateTimeField().to_representation
+
+
+def _file_url(field, name, request):
+    """Same as DRF's FileField with ``use_url``: absolute when a request is available."""
+    if not name:
+        return None
+    url = field.storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def _fmt_datetime(value):
+    return _datetime(value) if value is not None else None
+
+
+def _user_payloads(rows, context) -> dict:
+    request = (context or {}).get('request')
+    avatar = User._meta.get_field('avatar')
+    users = {}
+    for pk, username, email, signature, avatar_name, created_at, updated_at in rows:
+        users[pk] = {
+            'Userid': pk,
+            'username': username,
+            'email': email,
+            'signature': signature,
+            'avatar': _file_url(avatar, avatar_name, request),
+            'created_at': _fmt_datetime(created_at),
+            'updated_at': _fmt_datetime(updated_at),
+        }
+    return users
+
+
+def _users_query(user_ids):
+    return User.objects.filter(pk__in=user_ids).order_by().values_list(*USER_FIELDS)
+
+
+def serialize_users(user_ids, context=None) -> dict:
+    """``{Userid: UserSerializer payload}`` from one narrow query."""
+    if not user_ids:
+        return {}
+    return _user_payloads(_users_query(user_ids), context)
+
+
+async def aserialize_users(user_ids, context=None) -> dict:
+    if not user_ids:
+        return {}
+    return _user_payloads([row async for row in _users_query(user_ids)], context)
+
+
+def _user_ref(user_id, users, context):
+    if user_id is None:
+        return None
+    sideloaded = context.get('sideloaded_user_ids')
+    if sideloaded is not None:
+        sideloaded.add(user_id)
+        return user_id
+    return users[user_id]
+
+
+def _load_users(user_ids, context):
+    # Sideloaded responses only need the ids; the view serializes users once.
+    if context.get('sideloaded_user_ids') is not None:
+        return {}
+    return serialize_users(user_ids, context)
+
+
+async def _aload_users(user_ids, context):
+    if context.get('sideloaded_user_ids') is not None:
+        return {}
+    return await aserialize_users(user_ids, context)
+
+
+def _post_columns(fields):
+    return {POST_COLUMNS.get(name, name) for name in fields if name != 'tags'} | {'Blog_id'}
+
+
+def _post_tags_query(rows):
+    return (
+        Blogpost.tags.through.objects.filter(blogpost_id__in=[row['Blog_id'] for row in rows])
+        .order_by('tag_id').values_list('blogpost_id', 'tag_id')
+    )
+
+
+def _build_posts(rows, fields, context, users, tag_rows):
+    request = context.get('request')
+    rendered = context.get('rendered_html') or {}
+    if 'classification' in fields:
+        _, classifications = taxonomy_cache.get_lists(Classification, ClassificationSerializer)
+        if not {row['classification_id'] for row in rows} - {None} <= classifications.keys():
+            # Created after this process loaded the list (cache-held version not shared yet).
+            _, classifications = taxonomy_cache.reload(Classification, ClassificationSerializer)
+    post_tags = {}
+    if 'tags' in fields:
+        _, tags_by_pk = taxonomy_cache.get_lists(Tag, TagSerializer)
+        if not {tag_pk for _, tag_pk in tag_rows} <= tags_by_pk.keys():
+            _, tags_by_pk = taxonomy_cache.reload(Tag, TagSerializer)
+        # The prefetch in BlogpostViewSet has no ORDER BY; tags are listed by name here.
+        for post_pk, tag_pk in tag_rows:
+            if tag_pk in tags_by_pk:
+                post_tags.setdefault(post_pk, []).append(tags_by_pk[tag_pk])
+    cover = Blogpost._meta.get_field('cover_image')
+
+    builders = {
+        'author': lambda row: _user_ref(row['author_id'], users, context),
+        'classification': lambda row: (
+            classifications.get(row['classification_id']) if row['classification_id'] is not None else None
+        ),
+        'tags': lambda row: post_tags.get(row['Blog_id'], []),
+        'created_at': lambda row: _fmt_datetime(row['created_at']),
+        'updated_at': lambda row: _fmt_datetime(row['updated_at']),
+        'content_html': lambda row: (
+            rendered[row['Blog_id']] if row['Blog_id'] in rendered else render_markdown_safe(row['Content'] or '')
+        ),
+        'cover_image': lambda row: _file_url(cover, row['cover_image'], request),
+    }
+    getters = [(name, builders.get(name) or itemgetter(name)) for name in fields]
+    return [{name: get(row) for name, get in getters} for row in rows]
+
+
+def serialize_posts(queryset, context=None) -> list:
+    """
+    BlogpostSerializer(many=True) output for ``queryset``. Honours the sparse
+    fieldset in ``context['fields']``: only the columns those fields need are
+    selected, and ``content_html`` is rendered only when requested.
+    """
+    context = context or {}
+    fields = context.get('fields') or POST_READ_FIELDS
+    rows = list(queryset.prefetch_related(None).values(*_post_columns(fields)))
+    if not rows:
+        return []
+    users = {}
+    if 'author' in fields:
+        users = _load_users({row['author_id'] for row in rows if row['author_id'] is not None}, context)
+    tag_rows = _post_tags_query(rows) if 'tags' in fields else ()
+    return _build_posts(rows, fields, context, users, tag_rows)
+
+
+async def aserialize_posts(queryset, context=None) -> list:
+    """
+    ``serialize_posts`` on the async ORM. ``content_html`` is rendered in the
+    default executor so Markdown does not block the event loop.
+    """
+    context = context or {}
+    fields = context.get('fields') or POST_READ_FIELDS
+    rows = [row async for row in queryset.prefetch_related(None).values(*_post_columns(fields)).aiterator()]
+    if not rows:
+        return []
+    users = {}
+    if 'author' in fields:
+        users = await _aload_users({row['author_id'] for row in rows if row['author_id'] is not None}, context)
+    tag_rows = [row async for row in _post_tags_query(rows)] if 'tags' in fields else ()
+    if 'content_html' in fields:
+        media_map = await sync_to_async(get_media_url_map)()
+        contents = {row['Blog_id']: row['Content'] for row in rows}
+        rendered = await asyncio.get_running_loop().run_in_executor(None, _render_all, contents, media_map)
+        context = {**context, 'rendered_html': {**rendered, **(context.get('rendered_html') or {})}}
+    # Taxonomy lists come from the in-process cache; a reload touches the database.
+    return await sync_to_async(_build_posts)(rows, fields, context, users, tag_rows)
+
+
+def _render_all(contents, media_map):
+    return {pk: render_markdown_safe(content or '', media_map=media_map) for pk, content in contents.items()}
+
+
+def _comment_levels_query(parent_ids):
+    return Comment.objects.filter(Comment_parent__in=parent_ids).values_list(*COMMENT_FIELDS)
+
+
+def _build_comment_tree(levels, users, context):
+    max_depth = context.get('max_depth', 2)
+    current_depth = context.get('current_depth', 1)
+    children = {}
+    for depth in range(len(levels) - 1, -1, -1):
+        built = {}
+        for pk, time, content, status, banned, user_id, blog_id, parent_id in levels[depth]:
+            item = {
+                'Comment_id': pk,
+                'Comment_time': _fmt_datetime(time),
+                'Comment_content': content,
+                'Comment_status': status,
+                'Comment_banned': banned,
+                'Comment_user': _user_ref(user_id, users, context),
+                'Comment_blog': blog_id,
+                'Comment_parent': parent_id,
+                'replies': children.get(pk, []) if current_depth + depth < max_depth else [],
+            }
+            built.setdefault(parent_id, []).append(item)
+            if depth == 0:
+                built.setdefault('__top__', []).append(item)
+        children = built
+    return children.get('__top__', [])
+
+
+def serialize_comments(queryset, context=None) -> list:
+    """
+    CommentSerializer(many=True) output, including ``replies`` down to
+    ``context['max_depth']`` (one query per level).
+    """
+    context = context or {}
+    max_depth = context.get('max_depth', 2)
+    current_depth = context.get('current_depth', 1)
+
+    levels = [list(queryset.prefetch_related(None).select_related(None).values_list(*COMMENT_FIELDS))]
+    for _ in range(current_depth, max_depth):
+        parent_ids = [row[0] for row in levels[-1]]
+        if not parent_ids:
+            break
+        levels.append(list(_comment_levels_query(parent_ids)))
+
+    user_ids = {row[5] for level in levels for row in level if row[5] is not None}
+    return _build_comment_tree(levels, _load_users(user_ids, context), context)
+
+
+async def aserialize_comments(queryset, context=None) -> list:
+    """``serialize_comments`` on the async ORM."""
+    context = context or {}
+    max_depth = context.get('max_depth', 2)
+    current_depth = context.get('current_depth', 1)
+
+    # values_list() querysets are fetched whole: their aiterator() is not async-safe.
+    top = queryset.prefetch_related(None).select_related(None).values_list(*COMMENT_FIELDS)
+    levels = [[row async for row in top]]
+    for _ in range(current_depth, max_depth):
+        parent_ids = [row[0] for row in levels[-1]]
+        if not parent_ids:
+            break
+        levels.append([row async for row in _comment_levels_query(parent_ids)])
+
+    user_ids = {row[5] for level in levels for row in level if row[5] is not None}
+    return _build_comment_tree(levels, await _aload_users(user_ids, context), context)
@@ -0,0 +1,270 @@
+"""
+RSS/Atom feeds and a sharded sitemap, cached as precompressed documents.
+
+Each document is built once from a narrow ``values()`` query and stored in the
+``FEED_CACHE_ALIAS`` cache for ``FEED_CACHE_TIMEOUT`` seconds with its
+gzip/brotli variants and validators. The Blogpost and tag signal handlers in
+``models.py`` (and the admin bulk actions) invalidate only the documents a
+published (or previously published) post appears in, so the next request
+regenerates just those.
+
+Invalidation bumps a per-document version instead of deleting entries: links
+are absolute, so without ``SITE_URL`` every requesting host gets its own copy
+and all of them must go stale at once. With a per-process cache (the default
+``locmem``) other workers only see invalidations once the timeout runs out;
+point ``FEED_CACHE_ALIAS`` at a shared cache in multi-worker deployments.
+"""
+import hashlib
+import uuid
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Max
+from django.http import Http404
+from django.utils import feedgenerator
+from django.utils.http import quote_etag
+
+from .compression import compress_variants, precompressed_response
+
+FEED_SIZE = 20
+SITEMAP_SHARD_SIZE = 5000
+CACHE_PREFIX = 'feeds:'
+FEED_CLASSES = {
+    'rss': feedgenerator.Rss201rev2Feed,
+    'atom': feedgenerator.Atom1Feed,
+}
+PUBLISHED = {'Blog_status': 1, 'Vissible': True}
+
+
+def _cache():
+    return caches[getattr(settings, 'FEED_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'FEED_CACHE_TIMEOUT', 3600)
+
+
+def _key(*parts):
+    raw = ':'.join(str(p) for p in parts)
+    return CACHE_PREFIX + hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+def feed_key(kind, scope='all', name=''):
+    return _key('feed', kind, scope, name)
+
+
+def shard_key(shard):
+    return _key('sitemap', shard)
+
+
+SITEMAP_INDEX_KEY = _key('sitemap-index')
+
+
+def _version_key(key):
+    return f'{key}:v'
+
+
+def _document_keys(shards, classification_names=(), tag_names=()):
+    keys = [SITEMAP_INDEX_KEY, *(shard_key(shard) for shard in shards)]
+    for kind in FEED_CLASSES:
+        keys.append(feed_key(kind))
+        keys.extend(feed_key(kind, 'classification', name) for name in classification_names if name)
+        keys.extend(feed_key(kind, 'tag', name) for name in tag_names if name)
+    return keys
+
+
+def _invalidate(keys):
+    _cache().delete_many([_version_key(key) for key in keys])
+
+
+def invalidate_post(post_pk, classification_names=(), tag_names=()):
+    """Invalidate every cached document that lists the given post."""
+    _invalidate(_document_keys([post_pk // SITEMAP_SHARD_SIZE], classification_names, tag_names))
+
+
+def invalidate_posts(pks):
+    """``invalidate_post`` for posts changed with ``update()``/``bulk_update()``, which skip the signals."""
+    from .models import Blogpost
+
+    pks = list(pks)
+    if not pks:
+        return
+    classification_names = Blogpost.objects.filter(pk__in=pks).values_list('classification_id', flat=True)
+    tag_names = Blogpost.tags.through.objects.filter(blogpost_id__in=pks).values_list('tag_id', flat=True)
+    _invalidate(_document_keys(
+        {pk // SITEMAP_SHARD_SIZE for pk in pks}, set(classification_names), set(tag_names),
+    ))
+
+
+def _site_url(request):
+    return (getattr(settings, 'SITE_URL', '') or request.build_absolute_uri('/')).rstrip('/')
+
+
+def _host_key(request, key):
+    """Documents embed absolute links; without ``SITE_URL`` they depend on the Host header."""
+    if getattr(settings, 'SITE_URL', ''):
+        return key
+    return f'{key}:{request.get_host()}'
+
+
+def _get(request, key):
+    cache = _cache()
+    stored_key = _host_key(request, key)
+    found = cache.get_many([stored_key, _version_key(key)])
+    entry = found.get(stored_key)
+    if entry is None or entry['version'] != found.get(_version_key(key)):
+        return None
+    return entry
+
+
+def _post_url(site_url, slug):
+    return f'{site_url}/posts/{slug}/'
+
+
+def _published_posts():
+    from .models import Blogpost  # local import to avoid circular deps
+    return Blogpost.objects.filter(**PUBLISHED)
+
+
+def _current_version(key):
+    """Read before building, so an invalidation during the build is not lost."""
+    cache = _cache()
+    version = cache.get(_version_key(key))
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(_version_key(key), version, _timeout()):
+            version = cache.get(_version_key(key)) or version
+    return version
+
+
+def _store(request, key, version, body, content_type, last_modified):
+    entry = {
+        'variants': compress_variants(body),
+        'content_type': content_type,
+        'etag': 'W/' + quote_etag(hashlib.md5(body, usedforsecurity=False).hexdigest()),
+        'last_modified': int(last_modified.timestamp()) if last_modified else None,
+        'version': version,
+    }
+    _cache().set(_host_key(request, key), entry, _timeout())
+    return entry
+
+
+def _serve(request, entry):
+    return precompressed_response(
+        request, entry['variants'], entry['content_type'], entry['etag'], entry['last_modified'],
+    )
+
+
+def build_feed(request, kind, scope='all', name=''):
+    key = feed_key(kind, scope, name)
+    version = _current_version(key)
+    qs = _published_posts()
+    title = '最新文章'
+    if scope == 'classification':
+        qs = qs.filter(classification_id=name)
+        title = f'分类：{name}'
+    elif scope == 'tag':
+        qs = qs.filter(tags__name=name)
+        title = f'标签：{name}'
+    rows = list(
+        qs.order_by('-created_at')
+        .values('slug', 'title', 'summary', 'created_at', 'updated_at', 'author__username')[:FEED_SIZE]
+    )
+    site_url = _site_url(request)
+    feed = FEED_CLASSES[kind](
+        title=title,
+        link=f'{site_url}/',
+        description=title,
+        language=settings.LANGUAGE_CODE,
+        feed_url=site_url + request.get_full_path(),
+    )
+    for row in rows:
+        link = _post_url(site_url, row['slug'])
+        feed.add_item(
+            title=row['title'],
+            link=link,
+            description=row['summary'],
+            unique_id=link,
+            author_name=row['author__username'],
+            pubdate=row['created_at'],
+            updateddate=row['updated_at'],
+        )
+    body = feed.writeString('utf-8').encode('utf-8')
+    last_modified = max((row['updated_at'] for row in rows), default=None)
+    return _store(request, key, version, body, feed.content_type, last_modified)
+
+
+def feed_view(request, kind, scope='all', name=''):
+    from .models import Classification, Tag
+
+    if kind not in FEED_CLASSES:
+        raise Http404
+    entry = _get(request, feed_key(kind, scope, name))
+    if entry is None:
+        # Avoid caching documents for arbitrary, non-existent names.
+        taxonomy = {'classification': Classification, 'tag': Tag}.get(scope)
+        if taxonomy and not taxonomy.objects.filter(pk=name).exists():
+            raise Http404
+        entry = build_feed(request, kind, scope, name)
+    return _serve(request, entry)
+
+
+def build_sitemap_shard(request, shard):
+    version = _current_version(shard_key(shard))
+    site_url = _site_url(request)
+    start = shard * SITEMAP_SHARD_SIZE
+    rows = list(
+        _published_posts()
+        .filter(pk__gte=start, pk__lt=start + SITEMAP_SHARD_SIZE)
+        .order_by('pk')
+        .values_list('slug', 'updated_at')
+    )
+    if not rows:
+        return None
+    urls = ''.join(
+        f'<url><loc>{escape(_post_url(site_url, slug))}</loc><lastmod>{updated.date().isoformat()}</lastmod></url>'
+        for slug, updated in rows
+    )
+    body = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+    ).encode('utf-8')
+    return _store(request, shard_key(shard), version, body, 'application/xml', max(updated for _, updated in rows))
+
+
+def build_sitemap_index(request):
+    version = _current_version(SITEMAP_INDEX_KEY)
+    base = _site_url(request)
+    shards = list(
+        _published_posts().order_by()
+        .annotate(shard=F('pk') / SITEMAP_SHARD_SIZE)
+        .values('shard')
+        .annotate(lastmod=Max('updated_at'))
+        .order_by('shard')
+    )
+    entries = ''.join(
+        f"<sitemap><loc>{escape(base)}/sitemaps/posts-{row['shard']}.xml</loc>"
+        f"<lastmod>{row['lastmod'].date().isoformat()}</lastmod></sitemap>"
+        for row in shards
+    )
+    body = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</sitemapindex>'
+    ).encode('utf-8')
+    return _store(
+        request, SITEMAP_INDEX_KEY, version, body, 'application/xml',
+        max((r['lastmod'] for r in shards), default=None),
+    )
+
+
+def sitemap_index_view(request):
+    entry = _get(request, SITEMAP_INDEX_KEY) or build_sitemap_index(request)
+    return _serve(request, entry)
+
+
+def sitemap_shard_view(request, shard):
+    entry = _get(request, shard_key(shard)) or build_sitemap_shard(request, shard)
+    if entry is None:
+        raise Http404
+    return _serve(request, entry)
@@ -0,0 +1,87 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from myblog import feeds, response_cache, text_stats
+from myblog.models import Blogpost
+
+# bulk_update skips auto_now; updated_at moves the post ETags.
+FIELDS = ['summary', 'summary_auto', 'word_count', 'reading_time', 'updated_at']
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _compute_batch(rows):
+    return [(pk, summary, summary_auto, text_stats.compute(content)) for pk, content, summary, summary_auto in rows]
+
+
+class Command(BaseCommand):
+    help = '为已有文章批量计算摘要（为空时）、字数和阅读时长；按主键分批，多进程渲染 Markdown'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='每批文章数')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='计算进程数')
+        parser.add_argument('--all', action='store_true', help='包括已有字数统计的文章')
+
+    def handle(self, *args, **options):
+        qs = Blogpost.objects.order_by('pk')
+        if not options['all']:
+            qs = qs.filter(word_count=0).exclude(Content='')
+        batches = self._batches(qs, options['batch_size'])
+
+        updated = 0
+        if options['workers'] <= 1:
+            results = map(_compute_batch, batches)
+            updated = sum(self._save(batch) for batch in results)
+        else:
+            # Forked workers must not share the parent's DB connections.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                # Keep a bounded window of batches in flight instead of reading everything up front.
+                pending = deque()
+                for rows in batches:
+                    pending.append(pool.submit(_compute_batch, rows))
+                    if len(pending) >= options['workers'] * 2:
+                        updated += self._save(pending.popleft().result())
+                while pending:
+                    updated += self._save(pending.popleft().result())
+        self.stdout.write(self.style.SUCCESS(f'已更新 {updated} 篇文章'))
+
+    def _batches(self, qs, size):
+        """Keyset pagination over pk so each batch is one narrow query."""
+        last_pk = 0
+        while True:
+            rows = list(qs.filter(pk__gt=last_pk).values_list('pk', 'Content', 'summary', 'summary_auto')[:size])
+            if not rows:
+                return
+            last_pk = rows[-1][0]
+            yield rows
+
+    def _save(self, batch):
+        posts = []
+        now = timezone.now()
+        for pk, summary, summary_auto, stats in batch:
+            post = Blogpost(pk=pk, word_count=stats['word_count'], reading_time=stats['reading_time'], updated_at=now)
+            # Same rule as Blogpost._refresh_text_stats: only hand-written summaries are kept.
+            if summary and not summary_auto:
+                post.summary, post.summary_auto = summary, False
+            else:
+                post.summary, post.summary_auto = stats['summary'], True
+            posts.append(post)
+        Blogpost.objects.bulk_update(posts, FIELDS)
+        self._invalidate([post.pk for post in posts])
+        return len(posts)
+
+    def _invalidate(self, pks):
+        # bulk_update skips the signal handlers that normally drop cached lists and feeds.
+        response_cache.invalidate_tags('posts', *response_cache.post_tags(*pks))
+        feeds.invalidate_posts(pks)
@@ -0,0 +1,184 @@
+"""
+Load-test the read endpoints over WSGI and ASGI at high concurrency.
+
+In-process (default) the same request mix is driven through Django's WSGI
+handler from a thread pool and through the ASGI handler from concurrent
+tasks, both with the full middleware stack:
+
+* ``wsgi`` - sync DRF views, one thread per in-flight request;
+* ``asgi-sync`` - the same views under ASGI, each request hopping into the
+  thread that runs sync code;
+* ``asgi-async`` - with the ``async_views`` routes in front
+  (``ASYNC_READ_VIEWS``).
+
+``--target NAME=URL`` load-tests running servers instead, e.g.
+``gunicorn blog.wsgi --threads 32`` against
+``ASYNC_READ_VIEWS=true uvicorn blog.asgi:application``. The response cache
+is off unless ``--cache`` is given, so the views themselves are measured.
+"""
+import asyncio
+import statistics
+import threading
+import time
+import types
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import include, path
+
+from myblog import urls as api_urls
+from myblog.async_views import async_read_urls
+from myblog.models import Blogpost, Comment, Tag, User
+
+MODES = ('wsgi', 'asgi-sync', 'asgi-async')
+SEED_PREFIX = 'bench-asgi-'
+
+
+def _urlconf(async_reads):
+    module = types.ModuleType('benchmark_asgi_urls')
+    patterns = api_urls.urlpatterns
+    if async_reads:
+        patterns = async_read_urls(api_urls.router.urls) + patterns
+    module.urlpatterns = [path('api/', include(patterns))]
+    return module
+
+
+class Command(BaseCommand):
+    help = '高并发下对比 WSGI 与 ASGI（同步视图 / 原生异步视图）读接口的吞吐量与延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='每种模式的请求总数')
+        parser.add_argument('--concurrency', type=int, default=64, help='并发请求数')
+        parser.add_argument('--seed', type=int, default=200, help='生成的文章数（0 表示使用现有数据），结束后删除')
+        parser.add_argument('--mode', action='append', choices=MODES, help='只运行指定模式，可重复')
+        parser.add_argument('--target', action='append', default=[], help='压测运行中的服务：名称=基础URL，可重复')
+        parser.add_argument('--cache', action='store_true', help='保留响应缓存')
+
+    def handle(self, *args, **options):
+        seeded = self._seed(options['seed']) if options['seed'] else None
+        try:
+            paths = self._paths()
+            if not paths:
+                raise CommandError('没有文章可供压测，请使用 --seed')
+            cache_settings = {} if options['cache'] else {'RESPONSE_CACHE': {'ENABLED': False}}
+            with override_settings(**cache_settings):
+                if options['target']:
+                    for target in options['target']:
+                        name, _, base_url = target.partition('=')
+                        result = self._run_threads(self._url_fetcher(base_url.rstrip('/')), paths, options)
+                        self._report(name, result)
+                    return
+                for mode in options['mode'] or MODES:
+                    with override_settings(
+                        ROOT_URLCONF=_urlconf(mode == 'asgi-async'),
+                        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                    ):
+                        if mode == 'wsgi':
+                            result = self._run_threads(self._wsgi_fetcher(), paths, options)
+                        else:
+                            result = asyncio.run(self._run_tasks(paths, options))
+                    self._report(mode, result)
+        finally:
+            connections.close_all()
+            if seeded:
+                Blogpost.objects.filter(slug__startswith=SEED_PREFIX).delete()
+                Tag.objects.filter(name__startswith=SEED_PREFIX).delete()
+                User.objects.filter(username__startswith=SEED_PREFIX).delete()
+
+    def _paths(self):
+        slugs = list(Blogpost.objects.order_by('-created_at').values_list('slug', flat=True)[:20])
+        if not slugs:
+            return []
+        paths = ['/api/posts/', '/api/tags/', '/api/classifications/']
+        paths += [f'/api/posts/{slug}/' for slug in slugs[:10]]
+        paths += [f'/api/posts/{slug}/comments/' for slug in slugs[:10]]
+        return paths
+
+    def _wsgi_fetcher(self):
+        local = threading.local()
+
+        def fetch(path):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            return local.client.get(path).status_code
+        return fetch
+
+    def _url_fetcher(self, base_url):
+        def fetch(path):
+            with urllib.request.urlopen(base_url + path, timeout=30) as response:
+                response.read()
+                return response.status
+        return fetch
+
+    def _run_threads(self, fetch, paths, options):
+        def one(i):
+            started = time.perf_counter()
+            try:
+                status = fetch(paths[i % len(paths)])
+            except Exception:
+                status = None
+            return status, (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(one, range(options['requests'])))
+        return results, time.perf_counter() - started
+
+    async def _run_tasks(self, paths, options):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def one(i):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    status = (await client.get(paths[i % len(paths)])).status_code
+                except Exception:
+                    status = None
+                return status, (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(options['requests'])))
+        return results, time.perf_counter() - started
+
+    def _report(self, name, result):
+        results, elapsed = result
+        latencies = sorted(ms for status, ms in results if status == 200)
+        errors = len(results) - len(latencies)
+        if len(latencies) < 2:
+            self.stdout.write(self.style.ERROR(f'{name:<12} {errors} errors'))
+            return
+        cuts = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f'{name:<12} {len(latencies) / elapsed:8.1f} req/s  errors {errors:4d}  '
+            f'median {statistics.median(latencies):7.1f} ms  p95 {cuts[94]:7.1f} ms  p99 {cuts[98]:7.1f} ms'
+        )
+
+    def _seed(self, posts):
+        users = [
+            User.objects.create_user(username=f'{SEED_PREFIX}{i}', email=f'{SEED_PREFIX}{i}@example.com', password=None)
+            for i in range(10)
+        ]
+        tags = Tag.objects.bulk_create([Tag(name=f'{SEED_PREFIX}{i}') for i in range(10)])
+        created = Blogpost.objects.bulk_create([
+            Blogpost(
+                title=f'bench asgi {i}', slug=f'{SEED_PREFIX}{i}', Blog_status=1, author=users[i % len(users)],
+                Content=f'# 标题 {i}\n\n' + '正文 **markdown** text. ' * 50,
+            )
+            for i in range(posts)
+        ])
+        Blogpost.tags.through.objects.bulk_create([
+            Blogpost.tags.through(blogpost_id=post.pk, tag_id=tags[i % len(tags)].pk)
+            for i, post in enumerate(created)
+        ])
+        Comment.objects.bulk_create([
+            Comment(Comment_blog=post, Comment_user=users[j % len(users)], Comment_content=f'评论 {j}')
+            for post in created[:20]
+            for j in range(20)
+        ])
+        return created
@@ -0,0 +1,70 @@
+"""
+Per-request authentication cost of DRF token auth, the cached token auth,
+simplejwt and the cached JWT auth: time and database queries spent in
+``authenticate()`` for a stream of requests by a few users.
+
+Users and tokens are created in a transaction that is rolled back.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from myblog import authentication
+from myblog.models import User
+
+
+class Command(BaseCommand):
+    help = '对比 Token、缓存 Token、JWT 与缓存 JWT 认证的单次请求耗时和查询数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help='每种认证方式的请求数')
+        parser.add_argument('--users', type=int, default=20, help='轮流发起请求的用户数')
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        with transaction.atomic():
+            users = [
+                User.objects.create_user(username=f'bench-auth-{i}', email=f'bench-auth-{i}@example.com', password=None)
+                for i in range(options['users'])
+            ]
+            candidates = {
+                'token': (TokenAuthentication(), self._token_headers(users)),
+                'cached token': (authentication.CachedTokenAuthentication(), self._token_headers(users)),
+            }
+            if authentication.JWTCookieAuthentication is not None:
+                from rest_framework_simplejwt.tokens import AccessToken
+
+                jwt_headers = [f'Bearer {AccessToken.for_user(user)}' for user in users]
+                candidates['jwt'] = (authentication.JWTCookieAuthentication(), jwt_headers)
+                candidates['cached jwt'] = (authentication.CachedJWTAuthentication(), jwt_headers)
+            else:
+                self.stdout.write(self.style.WARNING('未安装 djangorestframework-simplejwt，跳过 JWT'))
+
+            for label, (authenticator, headers) in candidates.items():
+                authentication.get_cache().clear()
+                requests = [
+                    Request(factory.get('/api/posts/', HTTP_AUTHORIZATION=headers[i % len(headers)]))
+                    for i in range(options['requests'])
+                ]
+                timings = []
+                with CaptureQueriesContext(connection) as queries:
+                    for request in requests:
+                        started = time.perf_counter()
+                        authenticator.authenticate(request)
+                        timings.append((time.perf_counter() - started) * 1_000_000)
+                self.stdout.write(
+                    f'{label:<13} median {statistics.median(timings):8.1f} µs  '
+                    f'p95 {statistics.quantiles(timings, n=20)[-1]:8.1f} µs  '
+                    f'{len(queries) / len(requests):5.2f} queries/request'
+                )
+            transaction.set_rollback(True)
+
+    def _token_headers(self, users):
+        return [f'Token {Token.objects.get_or_create(user=user)[0].key}' for user in users]
@@ -0,0 +1,151 @@
+"""
+Seed a large post table and record EXPLAIN plans and latencies for the
+BlogpostViewSet filter combinations.
+
+Everything runs inside a transaction that is rolled back at the end (unless
+``--keep``), so it can be pointed at a scratch copy of any database. Use
+``--baseline`` with a previous ``--output`` report to fail on regressions.
+"""
+import json
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from myblog.models import Blogpost, Classification, Tag
+from myblog.views import BlogpostViewSet
+
+CLASSIFICATIONS = 10
+TAGS = 50
+TAGS_PER_POST = 3
+
+SCENARIOS = {
+    'default': {},
+    'published': {'status': '1'},
+    'published_unpinned': {'status': '1', 'is_pinned': 'false'},
+    'classification': {'classification': 'bench-class-3'},
+    'published_classification': {'status': '1', 'classification': 'bench-class-3'},
+    'tag': {'tags': 'bench-tag-7'},
+    'published_tag': {'status': '1', 'tags': 'bench-tag-7'},
+    'any_of_tags': {'tags': 'bench-tag-7,bench-tag-8,bench-tag-9'},
+    'all_of_tags': {'tags': 'bench-tag-7,bench-tag-8', 'tags_mode': 'all'},
+    'date_range': {'start': '__start__', 'end': '__end__'},
+    'published_date_range': {'status': '1', 'start': '__start__', 'end': '__end__'},
+}
+
+
+class Command(BaseCommand):
+    help = '生成大量文章并记录文章列表各筛选组合的 EXPLAIN 与耗时，用于发现查询性能回退'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000, help='生成的文章数')
+        parser.add_argument('--repeat', type=int, default=7, help='每个场景重复次数')
+        parser.add_argument('--page-size', type=int, default=20, help='每次取出的行数')
+        parser.add_argument('--output', help='把报告写入 JSON 文件')
+        parser.add_argument('--baseline', help='与之前的 JSON 报告对比中位数')
+        parser.add_argument('--tolerance', type=float, default=1.5, help='中位数超过基线多少倍视为回退')
+        parser.add_argument('--keep', action='store_true', help='保留生成的数据（默认回滚）')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.now = timezone.now()
+            self._seed(options['posts'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            report = {
+                'vendor': connection.vendor,
+                'posts': options['posts'],
+                'scenarios': {name: self._run(params, options) for name, params in SCENARIOS.items()},
+            }
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        for name, result in report['scenarios'].items():
+            self.stdout.write(f"{name:<28} median {result['median_ms']:8.2f} ms   p95 {result['p95_ms']:8.2f} ms")
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            self._compare(report, options['baseline'], options['tolerance'])
+
+    def _seed(self, count):
+        random.seed(0)
+        classifications = Classification.objects.bulk_create(
+            [Classification(name=f'bench-class-{i}', color='gray') for i in range(CLASSIFICATIONS)]
+        )
+        tags = Tag.objects.bulk_create([Tag(name=f'bench-tag-{i}', color='gray') for i in range(TAGS)])
+        created_at = Blogpost._meta.get_field('created_at')
+        # bulk_create would otherwise stamp every row with the same auto_now_add time.
+        created_at.auto_now_add = False
+        try:
+            for offset in range(0, count, 5000):
+                Blogpost.objects.bulk_create([
+                    Blogpost(
+                        title=f'bench post {i}',
+                        slug=f'bench-post-{i}',
+                        Content='benchmark ' * 200,
+                        Blog_status=random.choices([0, 1, 2], weights=[2, 7, 1])[0],
+                        Vissible=random.random() > 0.1,
+                        is_pinned=random.random() < 0.01,
+                        classification=random.choice(classifications),
+                        created_at=self.now - timedelta(minutes=i),
+                    )
+                    for i in range(offset, min(offset + 5000, count))
+                ])
+        finally:
+            created_at.auto_now_add = True
+
+        through = Blogpost.tags.through
+        post_ids = Blogpost.objects.filter(slug__startswith='bench-post-').values_list('pk', flat=True)
+        rows = []
+        for post_id in post_ids.iterator():
+            for tag in random.sample(tags, TAGS_PER_POST):
+                rows.append(through(blogpost_id=post_id, tag_id=tag.pk))
+            if len(rows) >= 10000:
+                through.objects.bulk_create(rows)
+                rows = []
+        through.objects.bulk_create(rows)
+
+    def _queryset(self, params):
+        params = dict(params)
+        if params.get('start') == '__start__':
+            params['start'] = (self.now - timedelta(days=30)).isoformat()
+            params['end'] = (self.now - timedelta(days=20)).isoformat()
+        view = BlogpostViewSet()
+        view.request = Request(APIRequestFactory().get('/api/posts/', params))
+        view.action = 'list'
+        view.format_kwarg = None
+        return view.get_queryset()
+
+    def _run(self, params, options):
+        qs = self._queryset(params)[:options['page_size']]
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            list(qs._chain())
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return {
+            'params': params,
+            'plan': qs.explain(),
+            'median_ms': statistics.median(timings),
+            'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        }
+
+    def _compare(self, report, baseline_path, tolerance):
+        with open(baseline_path, encoding='utf-8') as fh:
+            baseline = json.load(fh)['scenarios']
+        regressions = []
+        for name, result in report['scenarios'].items():
+            before = baseline.get(name)
+            if before and result['median_ms'] > before['median_ms'] * tolerance:
+                regressions.append(f"{name}: {before['median_ms']:.2f} -> {result['median_ms']:.2f} ms")
+        if regressions:
+            raise CommandError('查询性能回退：\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('未发现超过容差的回退'))
@@ -0,0 +1,78 @@
+"""
+Encode time and size of real ``/api/posts/`` and comment-tree payloads with
+DRF's JSONRenderer, FastJSONRenderer and (if installed) MessagePack.
+
+Sample rows are seeded in a rolled-back transaction; pass ``--posts 0`` to
+measure the current database as is.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from myblog import renderers
+from myblog.models import Blogpost, Comment, User
+from myblog.views import BlogpostViewSet
+
+
+class Command(BaseCommand):
+    help = '对比标准 JSON、orjson 与 MessagePack 渲染文章列表和评论树的耗时与体积'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=2000, help='生成的文章数（0 表示使用现有数据）')
+        parser.add_argument('--comments', type=int, default=2000, help='评论树中的评论数')
+        parser.add_argument('--repeat', type=int, default=20, help='每个渲染器重复次数')
+
+    def handle(self, *args, **options):
+        candidates = {'json (stdlib)': JSONRenderer(), 'json (fast)': renderers.FastJSONRenderer()}
+        if renderers.orjson is None:
+            self.stdout.write(self.style.WARNING('未安装 orjson，fast 渲染器退回标准库'))
+        if renderers.msgpack is not None:
+            candidates['msgpack'] = renderers.MessagePackRenderer()
+
+        with override_settings(RESPONSE_CACHE={'ENABLED': False}), transaction.atomic():
+            slug = self._seed(options['posts'], options['comments']) if options['posts'] else None
+            payloads = {
+                'posts list': self._payload({'get': 'list'}, '/api/posts/'),
+            }
+            slug = slug or Blogpost.objects.values_list('slug', flat=True).first()
+            if slug:
+                payloads['comment tree'] = self._payload({'get': 'comments'}, f'/api/posts/{slug}/comments/', slug=slug)
+            transaction.set_rollback(True)
+
+        for name, data in payloads.items():
+            for label, renderer in candidates.items():
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    body = renderer.render(data, renderer.media_type, {})
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(
+                    f'{name:<13} {label:<14} {len(body) / 1024:10.1f} KiB   median {statistics.median(timings):8.2f} ms'
+                )
+
+    def _payload(self, actions, path, **kwargs):
+        response = BlogpostViewSet.as_view(actions)(APIRequestFactory().get(path), **kwargs)
+        return response.data
+
+    def _seed(self, posts, comments):
+        users = [
+            User.objects.create_user(username=f'bench-render-{i}', email=f'bench-render-{i}@example.com', password=None)
+            for i in range(10)
+        ]
+        created = Blogpost.objects.bulk_create([
+            Blogpost(
+                title=f'bench render {i}', slug=f'bench-render-{i}', Blog_status=1, author=users[i % len(users)],
+                summary='基准测试摘要 benchmark summary ' * 3,
+            )
+            for i in range(posts)
+        ])
+        Comment.objects.bulk_create([
+            Comment(Comment_blog=created[0], Comment_user=users[i % len(users)], Comment_content=f'评论 comment {i}')
+            for i in range(comments)
+        ])
+        return created[0].slug
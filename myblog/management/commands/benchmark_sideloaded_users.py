@@ -0,0 +1,61 @@
+"""
+Compare nested vs ``?include=users`` payloads on a large comment thread.
+
+Seeds one post with many comments from a few users inside a rolled-back
+transaction and times the comment tree and comment list endpoints in both
+formats, reporting payload size and median latency.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from myblog.models import Blogpost, Comment, User
+from myblog.views import BlogpostViewSet, CommentViewSet
+
+
+class Command(BaseCommand):
+    help = '对比大评论串在嵌套用户与 ?include=users 两种格式下的响应体积和序列化耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comments', type=int, default=2000, help='评论数')
+        parser.add_argument('--users', type=int, default=5, help='参与评论的用户数')
+        parser.add_argument('--repeat', type=int, default=5, help='每个场景重复次数')
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        # Measure serialization, not the response cache.
+        with override_settings(RESPONSE_CACHE={'ENABLED': False}), transaction.atomic():
+            post = self._seed(options['comments'], options['users'])
+            scenarios = {
+                'comment tree': (BlogpostViewSet.as_view({'get': 'comments'}), f'/api/posts/{post.slug}/comments/', {'slug': post.slug}),
+                'comment list': (CommentViewSet.as_view({'get': 'list'}), f'/api/comments/?post={post.pk}', {}),
+            }
+            for name, (view, path, kwargs) in scenarios.items():
+                for label, suffix in (('nested', ''), ('include=users', '&include=users' if '?' in path else '?include=users')):
+                    size, timings = 0, []
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        response = view(factory.get(path + suffix), **kwargs)
+                        response.render()
+                        timings.append((time.perf_counter() - started) * 1000)
+                        size = len(response.content)
+                    self.stdout.write(
+                        f'{name:<14} {label:<14} {size / 1024:10.1f} KiB   median {statistics.median(timings):8.1f} ms'
+                    )
+            transaction.set_rollback(True)
+
+    def _seed(self, count, user_count):
+        users = [
+            User.objects.create_user(username=f'bench-user-{i}', email=f'bench-user-{i}@example.com', password=None)
+            for i in range(user_count)
+        ]
+        post = Blogpost.objects.create(title='bench thread', slug='bench-thread', Blog_status=1, author=users[0])
+        Comment.objects.bulk_create([
+            Comment(Comment_blog=post, Comment_user=users[i % user_count], Comment_content=f'comment {i}', Comment_status=1)
+            for i in range(count)
+        ])
+        return post
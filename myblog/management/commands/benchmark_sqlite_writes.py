@@ -0,0 +1,106 @@
+"""
+Post comments from many threads at once against the configured SQLite
+database and report throughput, latency and "database is locked" errors for:
+
+* ``baseline`` - driver defaults (rollback journal, deferred transactions);
+* ``tuned`` - the profile from ``blog/database.py`` (WAL, mmap, busy timeout,
+  immediate transactions);
+* ``queue`` - the tuned profile with writes funnelled through
+  ``sqlite_writes`` (one writer thread and connection).
+
+A scratch post receives the comments and is deleted afterwards. Point it at a
+copy of the database: ``baseline`` switches the file back to the rollback
+journal and the later modes to WAL, which persists in the file.
+"""
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.test.utils import override_settings
+
+from blog.database import sqlite_options
+from myblog import sqlite_writes
+from myblog.models import Blogpost, Comment, User
+
+MODES = ('baseline', 'tuned', 'queue')
+
+
+class Command(BaseCommand):
+    help = '多线程并发发表评论，对比默认 SQLite、调优参数与串行写队列的吞吐量和锁冲突'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='并发线程数')
+        parser.add_argument('--writes', type=int, default=50, help='每个线程发表的评论数')
+        parser.add_argument('--mode', action='append', choices=MODES, help='只运行指定模式，可重复')
+
+    def handle(self, *args, **options):
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('默认数据库不是 SQLite')
+        db_settings = connections.settings[DEFAULT_DB_ALIAS]
+        original_options = db_settings.get('OPTIONS', {})
+        user = User.objects.create_user(username='bench-sqlite-writer', email='bench-sqlite@example.com', password=None)
+        post = Blogpost.objects.create(title='bench sqlite writes', slug='bench-sqlite-writes', Blog_status=1)
+        try:
+            for mode in options['mode'] or MODES:
+                # Threads open fresh connections from these settings.
+                connections.close_all()
+                db_settings['OPTIONS'] = (
+                    {'init_command': 'PRAGMA journal_mode=DELETE'} if mode == 'baseline' else sqlite_options()
+                )
+                with override_settings(SQLITE_WRITE_QUEUE=mode == 'queue'):
+                    result = self._run(post, user, options['threads'], options['writes'])
+                    sqlite_writes.shutdown()
+                self._report(mode, result)
+        finally:
+            connections.close_all()
+            db_settings['OPTIONS'] = original_options
+            post.delete()
+            user.delete()
+
+    def _run(self, post, user, threads, writes):
+        latencies, errors = [], []
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def create(i):
+            return Comment.objects.create(Comment_blog=post, Comment_user=user, Comment_content=f'bench {i}')
+
+        def worker(index):
+            barrier.wait()
+            local_latencies, local_errors = [], []
+            for i in range(writes):
+                started = time.perf_counter()
+                try:
+                    if sqlite_writes.enabled():
+                        sqlite_writes.run(create, i)
+                    else:
+                        with transaction.atomic():
+                            create(i)
+                except OperationalError as exc:
+                    local_errors.append(str(exc))
+                else:
+                    local_latencies.append((time.perf_counter() - started) * 1000)
+            connections.close_all()
+            with lock:
+                latencies.extend(local_latencies)
+                errors.extend(local_errors)
+
+        pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return latencies, errors, time.perf_counter() - started
+
+    def _report(self, mode, result):
+        latencies, errors, elapsed = result
+        locked = sum('locked' in message for message in errors)
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else 0.0
+        self.stdout.write(
+            f'{mode:<9} {len(latencies):6d} ok  {locked:5d} locked  {len(errors) - locked:3d} other errors  '
+            f'{len(latencies) / elapsed:8.1f} writes/s  '
+            f'median {statistics.median(latencies) if latencies else 0:7.2f} ms  p95 {p95:7.2f} ms'
+        )
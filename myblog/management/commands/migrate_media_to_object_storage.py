@@ -0,0 +1,142 @@
+"""
+Move media that is still on local disk into object storage.
+
+Rows are scanned by primary key (keyset pagination), uploaded by a bounded
+thread pool sharing one S3 client, and written back with ``bulk_update`` once
+per batch. Already-migrated rows have a non-empty URL and are skipped, so an
+interrupted run can simply be restarted (or resumed with ``--after-pk``).
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from myblog import media_urls, object_storage, response_cache
+from myblog.models import Blogpost, PostImage
+
+logger = logging.getLogger(__name__)
+
+# (model, file field, url field)
+TARGETS = {
+    'covers': (Blogpost, 'cover_image', 'cover_object_url'),
+    'images': (PostImage, 'image', 'object_storage_url'),
+}
+
+
+class _RateLimiter:
+    """Spaces uploads evenly so that at most ``rate`` start per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next)
+            self._next = start_at + self.interval
+        delay = start_at - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Command(BaseCommand):
+    help = '将仍在本地磁盘的封面图和正文图片批量上传到对象存储，并回写直链'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=sorted(TARGETS), help='只迁移 covers 或 images')
+        parser.add_argument('--dry-run', action='store_true', help='只列出待迁移文件，不上传也不写库')
+        parser.add_argument('--workers', type=int, default=8, help='并发上传线程数')
+        parser.add_argument('--batch-size', type=int, default=100, help='每批扫描/回写的行数')
+        parser.add_argument('--rate', type=float, default=0, help='每秒最多发起的上传数，0 表示不限速')
+        parser.add_argument('--after-pk', type=int, default=0, help='从该主键之后继续（用于断点续传）')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers 和 --batch-size 必须大于 0')
+        dry_run = options['dry_run']
+        if not dry_run and not object_storage.is_enabled():
+            raise CommandError('对象存储未启用：请检查 OBJECT_STORAGE 环境变量和存储偏好开关')
+
+        names = [options['only']] if options['only'] else sorted(TARGETS)
+        client = None if dry_run else object_storage._client()
+        # Resolve the domain once instead of querying StoragePreference per file.
+        domain = None if dry_run else object_storage.resolve_public_domain()
+        limiter = _RateLimiter(options['rate'])
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for name in names:
+                self._migrate(name, pool, client, domain, limiter, options)
+        if not dry_run:
+            # bulk_update bypasses the PostImage signal handlers.
+            media_urls.invalidate()
+            response_cache.invalidate_tags('media')
+
+    def _migrate(self, name, pool, client, domain, limiter, options):
+        model, file_field, url_field = TARGETS[name]
+        qs = (
+            model.objects
+            .filter(**{url_field: ''})
+            .exclude(**{f'{file_field}__isnull': True})
+            .exclude(**{file_field: ''})
+            .only('pk', file_field, url_field)
+            .order_by('pk')
+        )
+        last_pk = options['after_pk']
+        uploaded = failed = 0
+
+        while True:
+            batch = list(qs.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            if options['dry_run']:
+                for obj in batch:
+                    self.stdout.write(f'[{name}] #{obj.pk} {getattr(obj, file_field).name}')
+                continue
+
+            def upload(obj):
+                field_file = getattr(obj, file_field)
+                try:
+                    local_path = field_file.path
+                    if not os.path.exists(local_path):
+                        return obj, None, '本地文件缺失'
+                    limiter.wait()
+                    key = str(field_file.name).lstrip('/')
+                    if not object_storage.put_local_file(client, local_path, key):
+                        return obj, None, '上传失败'
+                except Exception as exc:
+                    # One bad file (S3UploadFailedError, OSError, ...) must not
+                    # lose the URLs of the rest of the batch.
+                    logger.exception('Migrating %s #%s failed', name, obj.pk)
+                    return obj, None, f'上传失败：{exc}'
+                return obj, object_storage.build_public_url(key, domain=domain), None
+
+            changed = []
+            now = timezone.now()
+            for obj, remote_url, error in pool.map(upload, batch):
+                if remote_url:
+                    setattr(obj, url_field, remote_url)
+                    # bulk_update skips auto_now, which the post ETags rely on.
+                    obj.updated_at = now
+                    changed.append(obj)
+                else:
+                    failed += 1
+                    self.stderr.write(f'[{name}] #{obj.pk} {error}')
+            if changed:
+                model.objects.bulk_update(changed, [url_field, 'updated_at'])
+                if model is Blogpost:
+                    response_cache.invalidate_tags(*response_cache.post_tags(*(obj.pk for obj in changed)))
+                uploaded += len(changed)
+            self.stdout.write(f'[{name}] 已处理至 pk={last_pk}，成功 {uploaded}，失败 {failed}')
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'[{name}] 完成：成功 {uploaded}，失败 {failed}'))
@@ -0,0 +1,30 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from myblog.snapshot import SnapshotPublisher
+
+
+class Command(BaseCommand):
+    help = '为已发布且公开的文章生成静态快照（JSON/HTML），增量构建并原子切换 current 目录'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(settings.STATIC_SNAPSHOT_ROOT), help='快照根目录')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Markdown 渲染进程数')
+        parser.add_argument('--page-size', type=int, default=20, help='列表页每页文章数')
+        parser.add_argument('--keep', type=int, default=3, help='保留的历史版本数')
+        parser.add_argument('--full', action='store_true', help='忽略指纹，全部重新渲染')
+
+    def handle(self, *args, **options):
+        publisher = SnapshotPublisher(
+            options['output'],
+            workers=options['workers'],
+            page_size=options['page_size'],
+            full=options['full'],
+            keep=options['keep'],
+        )
+        stats = publisher.publish()
+        self.stdout.write(self.style.SUCCESS(
+            f"快照已发布到 {stats['release']}：共 {stats['posts']} 篇，重新渲染 {stats['rendered']}，复用 {stats['reused']}"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from myblog import archive
+
+
+class Command(BaseCommand):
+    help = '根据文章表全量重建归档统计（年/月、分类、标签、作者）'
+
+    def handle(self, *args, **options):
+        rows = archive.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'归档统计已重建：{rows} 条'))
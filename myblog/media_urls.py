@@ -0,0 +1,113 @@
+"""
+Rewrite local media references in rendered Markdown to object storage/CDN URLs.
+
+The ``image name -> url/size`` map is built from ``PostImage`` rows once and
+kept in the Django cache; it is invalidated from the PostImage and
+StoragePreference signal handlers in ``models.py``. ``get_version()`` feeds
+the same inputs into the post ETags.
+"""
+import re
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+CACHE_KEY = 'myblog:media-url-map'
+CACHE_TIMEOUT = 3600
+
+IMG_TAG_RE = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+ATTR_RE = r'\s{name}="([^"]*)"'
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
+
+
+def get_version() -> str:
+    """
+    Version of everything the rewritten URLs depend on (image rows and the
+    CDN domain), read from the rows in a single query.
+    """
+    from .models import PostImage, StoragePreference  # local import to avoid circular deps
+
+    images = connection.ops.quote_name(PostImage._meta.db_table)
+    preference = connection.ops.quote_name(StoragePreference._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT (SELECT COUNT(*) FROM {images}), (SELECT MAX(updated_at) FROM {images}), '
+            # get_solo() creates the row lazily; a missing row reads as no CDN domain.
+            f"(SELECT COALESCE(MAX(cdn_domain), '') FROM {preference})"
+        )
+        return repr(cursor.fetchone())
+
+
+def _build_map() -> dict:
+    from . import object_storage
+    from .models import PostImage, StoragePreference  # local import to avoid circular deps
+
+    cdn_domain = StoragePreference.get_solo().cdn_domain
+    mapping = {}
+    rows = PostImage.objects.values_list('image', 'object_storage_url', 'width', 'height')
+    for name, remote_url, width, height in rows.iterator():
+        if not name:
+            continue
+        if remote_url and cdn_domain:
+            # Honour the current CDN domain even for URLs stored before it changed.
+            remote_url = object_storage.build_public_url(name, domain=cdn_domain)
+        mapping[name] = (remote_url, width, height)
+    return mapping
+
+
+def get_media_url_map() -> dict:
+    mapping = cache.get(CACHE_KEY)
+    if mapping is None:
+        mapping = _build_map()
+        cache.set(CACHE_KEY, mapping, CACHE_TIMEOUT)
+    return mapping
+
+
+def _media_key(src: str) -> str | None:
+    media_prefix = '/' + settings.MEDIA_URL.strip('/') + '/'
+    path = urlparse(src).path
+    if not path.startswith('/'):
+        path = '/' + path
+    if not path.startswith(media_prefix):
+        return None
+    return unquote(path[len(media_prefix):])
+
+
+def _get_attr(tag, name):
+    match = re.search(ATTR_RE.format(name=name), tag)
+    return match.group(1) if match else None
+
+
+def rewrite_media_urls(html: str, mapping: dict | None = None) -> str:
+    """
+    Point ``<img src>`` of known media keys at their remote URL and add
+    ``loading="lazy"`` plus width/height when known.
+    """
+    if '<img' not in html:
+        return html
+    if mapping is None:
+        mapping = get_media_url_map()
+
+    def replace(match):
+        tag = match.group(0)
+        src = _get_attr(tag, 'src')
+        extra = []
+        key = _media_key(src) if src else None
+        if key in mapping:
+            remote_url, width, height = mapping[key]
+            if remote_url:
+                tag = tag.replace(f'src="{src}"', f'src="{remote_url}"', 1)
+            if width and height and _get_attr(tag, 'width') is None and _get_attr(tag, 'height') is None:
+                extra.append(f'width="{width}" height="{height}"')
+        if _get_attr(tag, 'loading') is None:
+            extra.append('loading="lazy"')
+        if not extra:
+            return tag
+        closing = '/>' if tag.endswith('/>') else '>'
+        return f"{tag[:-len(closing)].rstrip()} {' '.join(extra)}{closing}"
+
+    return IMG_TAG_RE.sub(replace, html)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myblog', '0002_postimage_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['-is_pinned', '-created_at'], name='post_list_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['Blog_status', '-is_pinned', '-created_at'], name='post_status_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['classification', '-is_pinned', '-created_at'], name='post_class_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['Blog_status', 'created_at'], name='post_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('Blog_status', 1), ('Vissible', True)), fields=['-is_pinned', '-created_at'], name='post_published_list_idx'),
+        ),
+    ]
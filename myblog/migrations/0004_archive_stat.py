@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myblog', '0003_blogpost_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('year', '年份'), ('month', '月份'), ('classification', '分类'), ('tag', '标签'), ('author', '作者')], max_length=16, verbose_name='维度')),
+                ('key', models.CharField(max_length=150, verbose_name='键')),
+                ('count', models.IntegerField(default=0, verbose_name='文章数')),
+            ],
+            options={
+                'verbose_name': '归档统计',
+                'verbose_name_plural': '归档统计',
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key'), name='archive_stat_unique_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myblog', '0004_archive_stat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='reading_time',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='阅读时长（分钟）'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='summary_auto',
+            field=models.BooleanField(default=False, editable=False, verbose_name='摘要自动生成'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='字数'),
+        ),
+    ]
@@ -1,14 +1,16 @@
 import hashlib
 from pathlib import Path
 from django.core.exceptions import ValidationError
+from django.core.files.images import get_image_dimensions
 from django.db import models
-from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.utils.text import slugify
-from . import object_storage
+from rest_framework.authtoken.models import Token
+from . import archive, comment_stream, feeds, media_urls, object_storage, response_cache, taxonomy_cache, text_stats
  
 
 # Create your models here.
@@ -131,6 +133,9 @@ class Blogpost(models.Model):
     Vissible = models.BooleanField(default=True, verbose_name='公开性')
     Content = models.TextField(blank=True, verbose_name ='文章内容')
     summary = models.TextField(blank=True, verbose_name='摘要')
+    summary_auto = models.BooleanField(default=False, editable=False, verbose_name='摘要自动生成')
+    word_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='字数')
+    reading_time = models.PositiveIntegerField(default=0, editable=False, verbose_name='阅读时长（分钟）')
     cover_image = models.ImageField(upload_to=cover_upload_to, null=True, blank=True, verbose_name='封面图')
     cover_object_url = models.URLField(max_length=1024, blank=True, default='', verbose_name='封面直链')
     views_count = models.PositiveIntegerField(default=0, verbose_name='浏览量')
@@ -161,6 +166,19 @@ class Blogpost(models.Model):
         verbose_name = '文章'
         verbose_name_plural = '文章'
         ordering = ['-is_pinned', '-created_at']
+        # Composite indexes matching BlogpostViewSet filters + default ordering.
+        indexes = [
+            models.Index(fields=['-is_pinned', '-created_at'], name='post_list_order_idx'),
+            models.Index(fields=['Blog_status', '-is_pinned', '-created_at'], name='post_status_list_idx'),
+            models.Index(fields=['classification', '-is_pinned', '-created_at'], name='post_class_list_idx'),
+            models.Index(fields=['Blog_status', 'created_at'], name='post_status_created_idx'),
+            # Partial index for the public listing; skipped on backends without partial indexes.
+            models.Index(
+                fields=['-is_pinned', '-created_at'],
+                condition=models.Q(Blog_status=1, Vissible=True),
+                name='post_published_list_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -182,10 +200,55 @@ class Blogpost(models.Model):
 
         return slug_candidate
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember loaded body/summary so save() can tell what the caller changed.
+        if 'Content' in field_names:
+            instance._loaded_content = values[field_names.index('Content')]
+        if 'summary' in field_names:
+            instance._loaded_summary = values[field_names.index('summary')]
+        return instance
+
+    def _content_changed(self, update_fields):
+        if update_fields is not None and 'Content' not in update_fields:
+            return False
+        if 'Content' in self.get_deferred_fields():
+            return False
+        if self._state.adding or not hasattr(self, '_loaded_content'):
+            return True
+        return self.Content != self._loaded_content
+
+    def _refresh_text_stats(self):
+        """摘要（为空或此前自动生成时）、字数、阅读时长"""
+        stats = text_stats.compute(self.Content)
+        changed = ['word_count', 'reading_time']
+        self.word_count = stats['word_count']
+        self.reading_time = stats['reading_time']
+        if not self.summary or self.summary_auto:
+            self.summary = stats['summary']
+            self.summary_auto = True
+            changed += ['summary', 'summary_auto']
+        return changed
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = self._generate_unique_slug()
+        update_fields = kwargs.get('update_fields')
+        if self.summary_auto and self.summary != getattr(self, '_loaded_summary', self.summary):
+            # Edited by hand: stop regenerating it.
+            self.summary_auto = False
+            if update_fields is not None:
+                update_fields = kwargs['update_fields'] = {*update_fields, 'summary_auto'}
+        if self._content_changed(update_fields):
+            changed = self._refresh_text_stats()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *changed}
         super().save(*args, **kwargs)
+        if 'Content' not in self.get_deferred_fields():
+            self._loaded_content = self.Content
+        if 'summary' not in self.get_deferred_fields():
+            self._loaded_summary = self.summary
         self._sync_cover_object_storage()
 
     def _sync_cover_object_storage(self):
@@ -210,6 +273,9 @@ class PostImage(models.Model):
     image = models.ImageField(upload_to=post_image_upload_to, verbose_name='图片')
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name='上传时间')
     object_storage_url = models.URLField(max_length=1024, blank=True, default='', verbose_name='对象存储直链')
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name='宽度')
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name='高度')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
     class Meta:
         verbose_name = '文章图片'
@@ -221,7 +287,17 @@ class PostImage(models.Model):
             return self.object_storage_url
         return self.image.url
 
+    def _fill_dimensions(self):
+        if self.width or not self.image:
+            return
+        try:
+            self.width, self.height = get_image_dimensions(self.image)
+        except (OSError, TypeError, ValueError):
+            # Remote-only (direct upload) or unreadable file; size stays unknown.
+            self.width = self.height = None
+
     def save(self, *args, **kwargs):
+        self._fill_dimensions()
         super().save(*args, **kwargs)
         if not self.image or not object_storage.is_enabled():
             return
@@ -229,8 +305,10 @@ class PostImage(models.Model):
             return
         remote_url = object_storage.upload_field_file(self.image)
         if remote_url:
-            PostImage.objects.filter(pk=self.pk).update(object_storage_url=remote_url)
+            PostImage.objects.filter(pk=self.pk).update(object_storage_url=remote_url, updated_at=timezone.now())
             self.object_storage_url = remote_url
+            media_urls.invalidate()
+            response_cache.invalidate_tags('media')
 
 
 class StoragePreference(models.Model):
@@ -256,6 +334,7 @@ class BaseTaxonomy(models.Model):
     name = models.CharField(max_length=32, primary_key=True, verbose_name='名称')
     color = models.CharField(max_length=32, verbose_name='颜色')
     item_count_cache = models.PositiveIntegerField(default=0, editable=False, verbose_name='关联数量')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
     @property
     def item_count(self):
@@ -268,7 +347,7 @@ class BaseTaxonomy(models.Model):
         new_count = related_qs.count()
         if new_count != self.item_count_cache:
             self.item_count_cache = new_count
-            self.save(update_fields=['item_count_cache'])
+            self.save(update_fields=['item_count_cache', 'updated_at'])
     
     class Meta:
         abstract = True
@@ -308,6 +387,7 @@ class CommentManager(models.Manager.from_queryset(CommentQuerySet)):
 class Comment(models.Model):
     Comment_id = models.AutoField(primary_key=True,verbose_name='评论ID')
     Comment_time = models.DateTimeField(auto_now_add=True, verbose_name='评论时间', db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     Comment_content = models.TextField(blank=True, verbose_name ='评论内容')
     STATUS_CHOICES = [
         (0, '草稿'),
@@ -358,17 +438,78 @@ class Comment(models.Model):
         if self.Comment_parent and self.Comment_parent.Comment_blog_id != self.Comment_blog_id:
             raise ValidationError(_('子评论与父评论必须属于同一文章'))
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember whether the loaded row was already streamed to SSE clients.
+        if 'Comment_status' in field_names and 'Comment_banned' in field_names:
+            instance._loaded_streamable = comment_stream.is_streamable(instance)
+        return instance
+
     def save(self, *args, **kwargs):
         self.full_clean()
         return super().save(*args, **kwargs)
 
 
 
+class ArchiveStat(models.Model):
+    """归档统计（按年/月、分类、标签、作者的已发布文章数），由信号增量维护"""
+    DIMENSION_CHOICES = [
+        (archive.YEAR, '年份'),
+        (archive.MONTH, '月份'),
+        (archive.CLASSIFICATION, '分类'),
+        (archive.TAG, '标签'),
+        (archive.AUTHOR, '作者'),
+    ]
+    dimension = models.CharField(max_length=16, choices=DIMENSION_CHOICES, verbose_name='维度')
+    key = models.CharField(max_length=150, verbose_name='键')
+    count = models.IntegerField(default=0, verbose_name='文章数')
+
+    class Meta:
+        verbose_name = '归档统计'
+        verbose_name_plural = '归档统计'
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key'], name='archive_stat_unique_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_dimension_display()} {self.key}: {self.count}"
+
+
+# Fields that decide whether/where a post appears in filtered, ordered lists.
+LIST_STATE_FIELDS = ('Blog_status', 'is_pinned', 'created_at', 'classification_id', 'Vissible')
+
+
+def _list_state(post):
+    return tuple(getattr(post, name) for name in LIST_STATE_FIELDS)
+
+
+def _invalidate_feeds(post, old_state=None):
+    """Drop cached feeds/sitemap shards listing a post that is or was published."""
+    states = [_list_state(post)] + ([old_state] if old_state else [])
+    if not any(state[0] == 1 and state[4] for state in states):
+        return
+    feeds.invalidate_post(
+        post.pk,
+        classification_names={state[3] for state in states},
+        tag_names=post.tags.values_list('pk', flat=True),
+    )
+
+
 @receiver(post_save, sender=Blogpost)
 def update_classification_on_save(sender, instance, created, **kwargs):
     """
     保存后处理分类计数相关逻辑
     """
+    old_state = getattr(instance, '_old_list_state', None)
+    list_changed = created or old_state != _list_state(instance)
+    response_cache.invalidate_tags(*response_cache.post_tags(instance.pk), 'posts' if list_changed else None)
+    _invalidate_feeds(instance, old_state)
+    old_buckets = getattr(instance, '_old_archive_buckets', None) or {}
+    if old_buckets or archive.is_published(instance):
+        tag_names = instance.tags.values_list('pk', flat=True) if archive.is_published(instance) else ()
+        archive.apply_change(old_buckets, archive.buckets(instance, tag_names))
+
     old_classification = getattr(instance, '_old_classification', None)
     new_classification = instance.classification
     if old_classification == new_classification:
@@ -383,9 +524,21 @@ def update_classification_on_delete(sender, instance, **kwargs):
     """
     删除后处理分类计数相关逻辑
     """
+    response_cache.invalidate_tags(
+        'posts', *response_cache.post_tags(instance.pk), *response_cache.comment_tags(instance.pk)
+    )
     if instance.classification:
         instance.classification.refresh_item_count()
 
+@receiver(pre_delete, sender=Blogpost)
+def invalidate_feeds_on_delete(sender, instance, **kwargs):
+    """
+    删除前失效订阅源并扣减归档统计（此时标签关联还在，可以定位到标签）
+    """
+    _invalidate_feeds(instance)
+    if archive.is_published(instance):
+        archive.apply_change(archive.collect([instance.pk]), {})
+
 @receiver(m2m_changed, sender=Blogpost.tags.through)
 def update_tag_on_change(sender, instance, action, **kwargs):
     """
@@ -395,6 +548,11 @@ def update_tag_on_change(sender, instance, action, **kwargs):
         # 在清空前记录旧标签以便刷新计数
         instance._old_tags = set(instance.tags.values_list('pk', flat=True))
         return
+    if action == "pre_remove":
+        # remove() 的 pk_set 可能包含本未关联的标签，归档统计只扣减实际关联的
+        if archive.is_published(instance):
+            instance._removed_tags = set(instance.tags.filter(pk__in=kwargs.get("pk_set") or ()).values_list('pk', flat=True))
+        return
 
     tags_to_refresh = set()
     if action in {"post_add", "post_remove"}:
@@ -407,6 +565,15 @@ def update_tag_on_change(sender, instance, action, **kwargs):
     else:
         return
 
+    response_cache.invalidate_tags('posts', *response_cache.post_tags(instance.pk))
+    if archive.is_published(instance):
+        feeds.invalidate_post(instance.pk, tag_names=tags_to_refresh)
+        if action == "post_add":
+            archive.apply({(archive.TAG, pk): 1 for pk in kwargs.get("pk_set") or ()})
+        elif action == "post_remove":
+            archive.apply({(archive.TAG, pk): -1 for pk in getattr(instance, "_removed_tags", ())})
+        else:
+            archive.apply({(archive.TAG, pk): -1 for pk in tags_to_refresh})
     if not tags_to_refresh:
         return
 
@@ -423,7 +590,85 @@ def remember_old_classification(sender, instance, **kwargs):
         try:
             old_instance = Blogpost.objects.get(pk=instance.pk)
             instance._old_classification = old_instance.classification
+            instance._old_list_state = _list_state(old_instance)
+            instance._old_archive_buckets = (
+                archive.collect([instance.pk]) if archive.is_published(old_instance) else None
+            )
         except Blogpost.DoesNotExist:
             instance._old_classification = None
+            instance._old_list_state = None
+            instance._old_archive_buckets = None
     else:
         instance._old_classification = None
+        instance._old_list_state = None
+        instance._old_archive_buckets = None
+
+
+@receiver(post_save, sender=PostImage)
+@receiver(post_delete, sender=PostImage)
+@receiver(post_save, sender=StoragePreference)
+def invalidate_media_url_map(sender, **kwargs):
+    """
+    图片或 CDN 设置变化时清空正文图片直链映射缓存，并失效嵌入图片的文章响应缓存
+    """
+    media_urls.invalidate()
+    response_cache.invalidate_tags('media')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_responses(sender, instance, **kwargs):
+    """
+    评论变化时失效对应文章的评论树缓存
+    """
+    response_cache.invalidate_tags(*response_cache.comment_tags(instance.Comment_blog_id))
+
+
+@receiver(post_save, sender=Comment)
+def stream_published_comment(sender, instance, **kwargs):
+    """
+    评论新发布（或审核通过）时推送到文章的评论 SSE 流
+    """
+    if not getattr(instance, '_loaded_streamable', False):
+        comment_stream.publish_comment(instance)
+    instance._loaded_streamable = comment_stream.is_streamable(instance)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Classification)
+@receiver(post_delete, sender=Classification)
+def invalidate_taxonomy_responses(sender, instance, **kwargs):
+    """
+    标签/分类变化（含计数刷新）时失效嵌入了它们的响应缓存和进程内列表缓存
+    """
+    prefix = 'tag' if sender is Tag else 'classification'
+    response_cache.invalidate_tags(f'{prefix}:{instance.pk}')
+    taxonomy_cache.bump()
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_responses(sender, instance, **kwargs):
+    response_cache.invalidate_tags(f'user:{instance.pk}')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_auth_user(sender, instance, **kwargs):
+    """
+    用户保存（含修改密码、停用）或删除时清除认证缓存中的该用户
+    """
+    from . import authentication  # local import to avoid circular deps
+
+    authentication.invalidate_user(instance)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_auth_token(sender, instance, **kwargs):
+    """
+    令牌删除（登出）或重建时清除认证缓存中的该令牌
+    """
+    from . import authentication  # local import to avoid circular deps
+
+    authentication.invalidate_token(instance.key)
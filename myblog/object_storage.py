@@ -58,26 +58,30 @@ def _client():
     )
 
 
-def build_public_url(key: str) -> str:
+def resolve_public_domain() -> str:
+    """Domain prefix used for public URLs (admin CDN > env domain > endpoint)."""
     cfg = _get_config()
     _, db_domain = _get_db_preference()
     domain = db_domain or cfg.get('public_domain') or cfg.get('endpoint') or ''
+    return domain.rstrip('/')
+
+
+def build_public_url(key: str, domain: str | None = None) -> str:
+    cfg = _get_config()
+    if domain is None:
+        domain = resolve_public_domain()
     bucket = cfg.get('bucket')
     domain = domain.rstrip('/')
     key = key.lstrip('/')
     return f"{domain}/{bucket}/{key}"
 
 
-def upload_local_file(local_path: str, key: str) -> str | None:
+def put_local_file(client, local_path: str, key: str) -> bool:
     """
-    Upload a local file to S3-compatible storage.
-    Returns the public URL if successful, otherwise None.
+    Upload a local file with an existing client, skipping the enable check.
+    Used by bulk jobs that share one (thread-safe) client across workers.
     """
-    if not is_enabled():
-        return None
-
     cfg = _get_config()
-    client = _client()
     content_type = mimetypes.guess_type(local_path)[0] or 'application/octet-stream'
     extra_args = {'ContentType': content_type}
     default_acl = cfg.get('default_acl')
@@ -88,11 +92,86 @@ def upload_local_file(local_path: str, key: str) -> str | None:
         client.upload_file(local_path, cfg['bucket'], key, ExtraArgs=extra_args)
     except (BotoCoreError, ClientError) as exc:  # pragma: no cover - network call
         logger.warning("Upload to object storage failed for %s: %s", key, exc)
+        return False
+    return True
+
+
+def upload_local_file(local_path: str, key: str) -> str | None:
+    """
+    Upload a local file to S3-compatible storage.
+    Returns the public URL if successful, otherwise None.
+    """
+    if not is_enabled():
         return None
 
+    if not put_local_file(_client(), local_path, key):
+        return None
     return build_public_url(key)
 
 
+def _acl_and_type(content_type: str):
+    cfg = _get_config()
+    params = {'ContentType': content_type}
+    if cfg.get('default_acl'):
+        params['ACL'] = cfg['default_acl']
+    return params
+
+
+def presign_put(key: str, content_type: str, size: int, expires_in: int | None = None) -> dict:
+    """
+    Presigned PUT for a direct browser upload.
+    The client must send the returned headers with a body of exactly
+    ``size`` bytes; the length is part of the signature.
+    """
+    cfg = _get_config()
+    expires_in = expires_in or cfg.get('presign_expires', 900)
+    params = _acl_and_type(content_type)
+    url = _client().generate_presigned_url(
+        'put_object',
+        Params={'Bucket': cfg['bucket'], 'Key': key, 'ContentLength': size, **params},
+        ExpiresIn=expires_in,
+    )
+    headers = {'Content-Type': content_type}
+    if 'ACL' in params:
+        headers['x-amz-acl'] = params['ACL']
+    return {'method': 'PUT', 'url': url, 'headers': headers, 'expires_in': expires_in}
+
+
+def max_upload_size() -> int:
+    """Largest accepted upload in bytes (presigned POST policies, chunked uploads)."""
+    return _get_config().get('max_upload_size') or 10 * 1024 * 1024
+
+
+def presign_post(key: str, content_type: str, size: int | None = None, expires_in: int | None = None) -> dict:
+    """
+    Presigned multipart POST policy. The body must be exactly ``size`` bytes
+    when given, otherwise anything up to ``max_upload_size()``.
+    """
+    cfg = _get_config()
+    expires_in = expires_in or cfg.get('presign_expires', 900)
+    min_size, max_size = (size, size) if size else (1, max_upload_size())
+    params = _acl_and_type(content_type)
+    fields = {'Content-Type': content_type}
+    conditions = [{'Content-Type': content_type}, ['content-length-range', min_size, max_size]]
+    if 'ACL' in params:
+        fields['acl'] = params['ACL']
+        conditions.append({'acl': params['ACL']})
+    post = _client().generate_presigned_post(
+        cfg['bucket'], key, Fields=fields, Conditions=conditions, ExpiresIn=expires_in,
+    )
+    return {'method': 'POST', 'url': post['url'], 'fields': post['fields'], 'expires_in': expires_in}
+
+
+def head_object(key: str) -> dict | None:
+    """Return object metadata, or None when the key does not exist."""
+    cfg = _get_config()
+    try:
+        return _client().head_object(Bucket=cfg['bucket'], Key=key)
+    except (BotoCoreError, ClientError) as exc:
+        logger.info("Object %s not found in storage: %s", key, exc)
+        return None
+
+
 def upload_field_file(field_file, key_prefix: str | None = None) -> str | None:
     """
     Upload a Django FileField to object storage.
@@ -0,0 +1,470 @@
+"""
+Response cache for anonymous read requests with dependency-tagged invalidation.
+
+Each cached response records the version of every tag it depends on
+(``post:<pk>``, ``tag:<name>``, ``classification:<name>``,
+``comments:<post pk>``, ``user:<pk>``, the ``posts`` list membership tag and
+``media`` for image URLs and the CDN domain).
+Invalidating a tag just stores a fresh random version, so any entry recorded
+with an older version is treated as a miss. This works the same on the
+in-process LRU and on a shared Django cache backend, and an evicted tag version
+can never resurrect a stale entry. The in-process backend keeps tag versions
+in their own LRU (``MAX_TAGS``) so large response bodies cannot evict them.
+Invalidations made inside a transaction are repeated once it commits, so a
+concurrent miss cannot re-cache rows read before the commit. Versions carry
+the time of the bump: tags only known from the computed payload are checked
+after computing, and the response is not stored if any was bumped after the
+computation started (it may have read the rows from before that write).
+
+Misses are computed from the primary database even in replica-read views.
+
+Misses are coalesced (single flight): the first request for a key takes a
+lease and computes, concurrent requests wait for its result instead of
+repeating the work. Entries past ``TIMEOUT`` but within ``STALE_TTL`` are
+served stale while the lease holder refreshes them.
+
+Entries are stored with the raw body first; gzip/brotli variants are added to
+the same entry once per fill, off the request path (see ``compression``), and
+hits send the variant matching ``Accept-Encoding``.
+"""
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from .compression import compress_variants, in_background, negotiate, weaken_etag
+from .db_router import replica_reads
+from .lru import LRUCache
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BACKEND': 'locmem',
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'STALE_TTL': 60,
+    'LOCK_TIMEOUT': 10,
+    'WAIT_TIMEOUT': 5,
+    'MAX_ENTRIES': 2048,
+    'MAX_TAGS': 100000,
+}
+KEY_PREFIX = 'rc:resp:'
+TAG_PREFIX = 'rc:tag:'
+LEASE_PREFIX = 'rc:lease:'
+POLL_INTERVAL = 0.05
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Vary', 'Allow')
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+class LocMemBackend:
+    """Per-process LRU; the default for single-worker deployments."""
+
+    def __init__(self, config):
+        self._cache = LRUCache(max_entries=config['MAX_ENTRIES'])
+        self._tags = LRUCache(max_entries=config['MAX_TAGS'])
+
+    def _store(self, key):
+        return self._tags if key.startswith(TAG_PREFIX) else self._cache
+
+    def get(self, key):
+        return self._store(key).get(key)
+
+    def get_many(self, keys):
+        result = {}
+        for key in keys:
+            value = self._store(key).get(key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    def set(self, key, value, timeout=None):
+        self._store(key).set(key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        return self._store(key).add(key, value, timeout)
+
+    def set_many(self, mapping, timeout=None):
+        for key, value in mapping.items():
+            self._store(key).set(key, value, timeout)
+
+    def delete(self, key):
+        self._store(key).delete(key)
+
+    def clear(self):
+        self._cache.clear()
+        self._tags.clear()
+
+
+class DjangoCacheBackend:
+    """Shared backend on a ``CACHES`` alias (Redis/Memcached) for multi-worker setups."""
+
+    def __init__(self, config):
+        self._cache = caches[config['CACHE_ALIAS']]
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def get_many(self, keys):
+        return self._cache.get_many(keys)
+
+    def set(self, key, value, timeout=None):
+        self._cache.set(key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        return self._cache.add(key, value, timeout)
+
+    def set_many(self, mapping, timeout=None):
+        self._cache.set_many(mapping, timeout)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+    def clear(self):
+        # Use a dedicated alias: this clears everything stored in it.
+        self._cache.clear()
+
+
+BACKENDS = {
+    'locmem': LocMemBackend,
+    'django': DjangoCacheBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        config = get_config()
+        _backend = BACKENDS[config['BACKEND']](config)
+    return _backend
+
+
+@receiver(setting_changed)
+def _reset_backend(setting, **kwargs):
+    global _backend
+    if setting in ('RESPONSE_CACHE', 'CACHES'):
+        _backend = None
+
+
+def clear():
+    get_backend().clear()
+    _metrics.reset()
+
+
+class Metrics:
+    """Per-process counters; read them through ``metrics()``."""
+    NAMES = ('hits', 'misses', 'stale_served', 'refreshes', 'coalesced_waits', 'wait_timeouts')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._counts = dict.fromkeys(self.NAMES, 0)
+
+    def incr(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+_metrics = Metrics()
+
+
+def metrics() -> dict:
+    return _metrics.snapshot()
+
+
+def record(name):
+    """Count an event served outside ``ResponseCacheMixin`` (the async views)."""
+    _metrics.incr(name)
+
+
+class SingleFlight:
+    """
+    Lease-based leader election per cache key. The lease lives in the cache
+    backend so it also coalesces across processes with a shared backend;
+    local followers are woken by an Event, remote ones poll.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {}
+
+    def acquire(self, key) -> bool:
+        if not get_backend().add(LEASE_PREFIX + key, 1, get_config()['LOCK_TIMEOUT']):
+            return False
+        with self._lock:
+            self._events[key] = threading.Event()
+        return True
+
+    def release(self, key):
+        get_backend().delete(LEASE_PREFIX + key)
+        with self._lock:
+            event = self._events.pop(key, None)
+        if event:
+            event.set()
+
+    def wait(self, key):
+        """Wait for the leader's entry; None if it failed or timed out."""
+        backend = get_backend()
+        deadline = time.monotonic() + get_config()['WAIT_TIMEOUT']
+        with self._lock:
+            event = self._events.get(key)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if event is not None:
+                event.wait(min(POLL_INTERVAL, remaining))
+            else:
+                time.sleep(min(POLL_INTERVAL, remaining))
+            entry = get_entry(key)
+            if entry is not None:
+                return entry
+            if backend.get(LEASE_PREFIX + key) is None:
+                return None
+
+
+_flight = SingleFlight()
+
+
+def _new_version(bumped_at):
+    return f'{bumped_at:.6f}:{uuid.uuid4().hex}'
+
+
+def _bumped_at(version) -> float:
+    return float(version.partition(':')[0])
+
+
+def tag_versions(tags) -> dict:
+    """Current version for each tag, initialising missing ones."""
+    if not tags:
+        return {}
+    backend = get_backend()
+    keys = {f'{TAG_PREFIX}{tag}': tag for tag in tags}
+    found = backend.get_many(list(keys))
+    versions = {}
+    for key, tag in keys.items():
+        version = found.get(key)
+        if version is None:
+            # Never bumped (or evicted): no write to report.
+            version = _new_version(0)
+            if not backend.add(key, version, None):
+                version = backend.get(key) or version
+        versions[tag] = version
+    return versions
+
+
+def fill_versions(versions, started, tags):
+    """
+    ``versions`` plus the current versions of the payload-derived ``tags``,
+    or None if one of them was bumped after ``started`` (do not store).
+    """
+    extra = tag_versions(set(tags) - set(versions))
+    if any(_bumped_at(version) > started for version in extra.values()):
+        return None
+    return {**versions, **extra}
+
+
+def _bump(tags):
+    version = time.time()
+    get_backend().set_many({f'{TAG_PREFIX}{tag}': _new_version(version) for tag in tags}, None)
+
+
+def invalidate_tags(*tags):
+    tags = [tag for tag in tags if tag]
+    if not tags:
+        return
+    _bump(tags)
+    if connection.in_atomic_block:
+        # A miss in another request may cache pre-commit rows; bump again after.
+        transaction.on_commit(lambda: _bump(tags))
+
+
+def post_tags(*pks):
+    return [f'post:{pk}' for pk in pks]
+
+
+def comment_tags(*post_pks):
+    """Comment trees depend on one tag per post, whatever the number of comments."""
+    return [f'comments:{pk}' for pk in post_pks]
+
+
+def build_key(request) -> str:
+    params = sorted(
+        (name, sorted(v for v in values if v))
+        for name, values in request.query_params.lists()
+        if any(values)
+    )
+    raw = f'{request.path}|{params}|{request.accepted_media_type}'
+    return KEY_PREFIX + hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+def get_entry(key):
+    entry = get_backend().get(key)
+    if entry is None:
+        return None
+    current = tag_versions(entry['tags'])
+    if current != entry['tags']:
+        return None
+    return entry
+
+
+def store_entry(key, response, versions):
+    config = get_config()
+    entry = {
+        'status': response.status_code,
+        'content': response.content,
+        'headers': {name: response[name] for name in STORED_HEADERS if response.has_header(name)},
+        'tags': versions,
+        'fresh_until': time.time() + config['TIMEOUT'],
+        'fill_id': uuid.uuid4().hex,
+    }
+    get_backend().set(key, entry, config['TIMEOUT'] + config['STALE_TTL'])
+    in_background(add_compressed_variants, key, entry)
+    return entry
+
+
+def add_compressed_variants(key, entry):
+    """Attach precompressed bodies to a stored entry unless it was replaced meanwhile."""
+    variants = compress_variants(entry['content'])
+    if len(variants) == 1:
+        return
+    backend = get_backend()
+    current = backend.get(key)
+    if current is None or current.get('fill_id') != entry['fill_id']:
+        return
+    variants.pop('identity')
+    ttl = entry['fresh_until'] - time.time() + get_config()['STALE_TTL']
+    if ttl > 0:
+        backend.set(key, {**current, 'variants': variants}, ttl)
+
+
+def entry_to_response(request, entry, state='HIT'):
+    variants = entry.get('variants') or {}
+    encoding = negotiate(request.headers.get('Accept-Encoding', ''), variants)
+    etag = entry['headers'].get('ETag')
+    response = HttpResponse(variants.get(encoding, entry['content']), status=entry['status'])
+    for name, value in entry['headers'].items():
+        response[name] = value
+    if variants:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    if encoding in variants:
+        response['Content-Encoding'] = encoding
+        etag = weaken_etag(etag)
+        if etag:
+            response['ETag'] = etag
+    response['X-Cache'] = state
+    last_modified = parse_http_date_safe(entry['headers'].get('Last-Modified', ''))
+    not_modified = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified,
+        response=response,
+    )
+    return not_modified or response
+
+
+class ResponseCacheMixin:
+    """
+    ViewSet mixin caching rendered responses of anonymous safe requests.
+    Subclasses describe dependencies through ``get_cache_base_tags()`` (known
+    before the response is computed) and ``get_cache_tags(data)`` (derived from
+    the serialized payload).
+    """
+    cached_actions = ('list', 'retrieve')
+
+    def get_cache_base_tags(self, request):
+        return set()
+
+    def get_cache_tags(self, data):
+        return set()
+
+    def is_response_cacheable(self, request):
+        return (
+            get_config()['ENABLED']
+            and request.method in ('GET', 'HEAD')
+            and self.action in self.cached_actions
+            and not request.user.is_authenticated
+        )
+
+    def serve_cached(self, request, compute):
+        self._response_cache_fill = None
+        if not self.is_response_cacheable(request):
+            return compute()
+        key = build_key(request)
+        entry = get_entry(key)
+        if entry is not None and entry['fresh_until'] > time.time():
+            _metrics.incr('hits')
+            return entry_to_response(request, entry)
+
+        leader = _flight.acquire(key)
+        if entry is not None:
+            if not leader:
+                # Someone is already refreshing: serve the stale copy meanwhile.
+                _metrics.incr('stale_served')
+                return entry_to_response(request, entry, 'STALE')
+            _metrics.incr('refreshes')
+        elif not leader:
+            entry = _flight.wait(key)
+            if entry is not None:
+                _metrics.incr('coalesced_waits')
+                return entry_to_response(request, entry, 'COALESCED')
+            _metrics.incr('wait_timeouts')
+        else:
+            _metrics.incr('misses')
+
+        # Snapshot versions before computing so a concurrent invalidation wins.
+        # Fill from the primary: a lagging replica would be stored under
+        # versions already bumped for the newer rows.
+        started = time.time()
+        try:
+            with replica_reads(False):
+                self._response_cache_fill = (key, tag_versions(self.get_cache_base_tags(request)), started, leader)
+                return compute()
+        except BaseException:
+            if leader:
+                _flight.release(key)
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        fill = getattr(self, '_response_cache_fill', None)
+        if not fill:
+            return response
+        key, versions, started, leader = fill
+        self._response_cache_fill = None
+        try:
+            if response.status_code == 200 and isinstance(response, Response):
+                versions = fill_versions(versions, started, self.get_cache_tags(response.data))
+                response.render()
+                if versions is not None:
+                    store_entry(key, response, versions)
+                response['X-Cache'] = 'MISS'
+        finally:
+            if leader:
+                _flight.release(key)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.serve_cached(request, lambda: super(ResponseCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.serve_cached(request, lambda: super(ResponseCacheMixin, self).retrieve(request, *args, **kwargs))
@@ -4,7 +4,9 @@ from django.contrib.auth import get_user_model
 from django.utils.html import escape
 from allauth.account.adapter import get_adapter
 from allauth.account.utils import setup_user_email
-from .models import Blogpost, Comment, Classification, Tag
+from . import chunked_upload, object_storage
+from .media_urls import rewrite_media_urls
+from .models import Blogpost, Comment, Classification, Tag, PostImage
 
 try:
     import markdown as md
@@ -23,15 +25,17 @@ SAFE_HTML_TAGS = [
 SAFE_HTML_ATTRIBUTES = {
     '*': ['class'],
     'a': ['href', 'title', 'name', 'rel'],
-    'img': ['src', 'alt', 'title'],
+    'img': ['src', 'alt', 'title', 'width', 'height', 'loading'],
 }
 SAFE_PROTOCOLS = ['http', 'https', 'data']
 
 
-def render_markdown_safe(content: str) -> str:
+def render_markdown_safe(content: str, media_map: dict | None = None) -> str:
     """
     Render markdown text to sanitized HTML. If markdown/bleach are unavailable,
     fall back to escaped text with simple line breaks.
+    Local media images are rewritten to their object storage/CDN URLs;
+    pass ``media_map`` to skip the cache lookup (e.g. in batch jobs).
     """
     if not content:
         return ''
@@ -55,7 +59,7 @@ def render_markdown_safe(content: str) -> str:
         )
         # Ensure external links have rel to mitigate tabnabbing
         html = html.replace('<a ', '<a rel="noopener" ')
-    return html
+    return rewrite_media_urls(html, media_map)
 
 User = get_user_model()
 
@@ -93,6 +97,24 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ('Userid', 'created_at', 'updated_at')
 
 
+class SideloadableUserSerializer(UserSerializer):
+    """
+    Nested user; when the context carries ``sideloaded_user_ids`` (``?include=users``)
+    only the Userid is emitted and collected, without loading the user row.
+    """
+
+    def get_attribute(self, instance):
+        if self.context.get('sideloaded_user_ids') is None:
+            return super().get_attribute(instance)
+        return getattr(instance, f'{self.source_attrs[-1]}_id')
+
+    def to_representation(self, instance):
+        user_ids = self.context.get('sideloaded_user_ids')
+        if user_ids is None:
+            return super().to_representation(instance)
+        user_ids.add(instance)
+        return instance
+
 class ClassificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Classification
@@ -108,7 +130,7 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 class CommentSerializer(serializers.ModelSerializer):
-    Comment_user = UserSerializer(read_only=True)
+    Comment_user = SideloadableUserSerializer(read_only=True)
     replies = serializers.SerializerMethodField()
 
     class Meta:
@@ -153,8 +175,39 @@ class CommentSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+# Readable BlogpostSerializer fields, in output order.
+POST_READ_FIELDS = (
+    'Blog_id', 'title', 'slug', 'author', 'classification', 'tags', 'created_at', 'updated_at', 'Vissible',
+    'Content', 'content_html', 'summary', 'word_count', 'reading_time', 'cover_image', 'views_count',
+    'likes_count', 'is_pinned', 'Blog_status',
+)
+# Compact card used by default on post lists: no body or rendered HTML; the
+# summary, word count and reading time are precomputed columns.
+POST_CARD_FIELDS = tuple(name for name in POST_READ_FIELDS if name not in {'Content', 'content_html'})
+
+
+def resolve_fieldset(params, default=POST_READ_FIELDS):
+    """
+    Fields selected by ``?fields=a,b`` / ``?exclude=c``. ``exclude`` alone
+    applies to the full field set; unknown names are ignored and ``Blog_id``
+    is always kept.
+    """
+    def names(key):
+        return {v.strip() for value in params.getlist(key) for v in value.split(',') if v.strip()}
+
+    fields, exclude = names('fields'), names('exclude')
+    if fields:
+        selected = fields
+    elif exclude:
+        selected = set(POST_READ_FIELDS)
+    else:
+        selected = set(default)
+    selected = (selected - exclude) | {'Blog_id'}
+    return tuple(name for name in POST_READ_FIELDS if name in selected)
+
+
 class BlogpostSerializer(serializers.ModelSerializer):
-    author = UserSerializer(read_only=True)
+    author = SideloadableUserSerializer(read_only=True)
     classification = ClassificationSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     classification_id = serializers.PrimaryKeyRelatedField(
@@ -189,6 +242,8 @@ class BlogpostSerializer(serializers.ModelSerializer):
             'Content',
             'content_html',
             'summary',
+            'word_count',
+            'reading_time',
             'cover_image',
             'views_count',
             'likes_count',
@@ -205,6 +260,14 @@ class BlogpostSerializer(serializers.ModelSerializer):
             'likes_count',
         ]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldset (``context['fields']``) trims the readable fields only.
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in [n for n, field in self.fields.items() if not field.write_only and n not in fields]:
+                self.fields.pop(name)
+
     def create(self, validated_data):
         request = self.context.get('request')
         tags = validated_data.pop('tag_ids', [])
@@ -228,4 +291,65 @@ class BlogpostSerializer(serializers.ModelSerializer):
         return instance
 
     def get_content_html(self, obj):
+        # Batch jobs may pre-render HTML (e.g. in worker processes) and pass it in.
+        rendered = self.context.get('rendered_html')
+        if rendered is not None and obj.pk in rendered:
+            return rendered[obj.pk]
         return render_markdown_safe(obj.Content or '')
+
+
+class PostImageSerializer(serializers.ModelSerializer):
+    url = serializers.ReadOnlyField()
+
+    class Meta:
+        model = PostImage
+        fields = ['id', 'post', 'url', 'uploaded_at']
+        read_only_fields = fields
+
+
+class DirectUploadSerializer(serializers.Serializer):
+    """申请直传对象存储的预签名地址"""
+    KIND_CHOICES = ['image', 'cover']
+    METHOD_CHOICES = ['put', 'post']
+
+    kind = serializers.ChoiceField(choices=KIND_CHOICES, default='image')
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.CharField(max_length=100)
+    size = serializers.IntegerField(min_value=1)
+    method = serializers.ChoiceField(choices=METHOD_CHOICES, default='put')
+
+    def validate_filename(self, value):
+        if chunked_upload.content_type_for(value) is None:
+            raise serializers.ValidationError('只允许上传图片')
+        return value
+
+    def validate_size(self, value):
+        if value > object_storage.max_upload_size():
+            raise serializers.ValidationError(f'文件大小不能超过 {object_storage.max_upload_size()} 字节')
+        return value
+
+    def validate(self, attrs):
+        if attrs['content_type'] != chunked_upload.content_type_for(attrs['filename']):
+            raise serializers.ValidationError({'content_type': '文件类型与扩展名不符'})
+        return attrs
+
+
+class DirectUploadCompleteSerializer(serializers.Serializer):
+    upload_token = serializers.CharField()
+
+
+class ChunkedUploadSerializer(serializers.Serializer):
+    """创建分片上传会话"""
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$')
+
+    def validate_filename(self, value):
+        if chunked_upload.extension(value) not in chunked_upload.IMAGE_FORMATS:
+            raise serializers.ValidationError('只允许上传图片')
+        return value
+
+    def validate_size(self, value):
+        if value > object_storage.max_upload_size():
+            raise serializers.ValidationError(f'文件大小不能超过 {object_storage.max_upload_size()} 字节')
+        return value
@@ -0,0 +1,253 @@
+"""
+Static snapshot publisher for published posts.
+
+Writes pre-rendered JSON/HTML that a web server can serve without Django::
+
+    <root>/current -> releases/<id>/
+        posts/<slug>.json             post detail (same payload as the API)
+        posts/<slug>.html             standalone HTML page
+        posts/<slug>/comments.json    comment tree
+        pages/page-<n>.json           post list pages
+        tags/<name>/page-<n>.json
+        classifications/<name>/page-<n>.json
+        manifest.json                 per-post fingerprints for incremental builds
+
+Each build goes into a fresh release directory; only posts whose fingerprint
+(content, taxonomy, author, comments, images, media/CDN settings) changed are
+rendered again, the rest are hard-linked from the previous release.
+``current`` is then swapped with an atomic symlink rename. Markdown rendering
+is spread across worker processes.
+
+Model imports are local so that spawned worker processes can import this
+module before ``django.setup()`` has run.
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Max
+from django.template.loader import render_to_string
+from rest_framework.utils.encoders import JSONEncoder
+
+# Bump when the snapshot layout or payload changes to force a full rebuild.
+FORMAT_VERSION = 1
+PUBLISHED = {'Blog_status': 1, 'Vissible': True}
+MANIFEST = 'manifest.json'
+COMMENT_DEPTH = 2
+
+_worker_media_map = None
+
+
+def _init_worker(media_map):
+    global _worker_media_map
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    _worker_media_map = media_map
+
+
+def _render_one(item):
+    from .serializers import render_markdown_safe
+    pk, content = item
+    return pk, render_markdown_safe(content or '', _worker_media_map)
+
+
+def _dump(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, cls=JSONEncoder, ensure_ascii=False), encoding='utf-8')
+
+
+def _link_or_copy(src: Path, dest: Path):
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+def _media_settings():
+    """Settings that change rendered image URLs in every post."""
+    from . import object_storage
+    from .models import StoragePreference
+
+    return (
+        settings.MEDIA_URL,
+        StoragePreference.get_solo().cdn_domain,
+        object_storage.resolve_public_domain(),
+        object_storage._get_config().get('bucket'),
+    )
+
+
+def compute_fingerprints():
+    """
+    ``{pk: {'slug', 'fp', 'tags', 'classification'}}`` for every published post,
+    built from narrow aggregate queries without loading ``Content`` rows.
+    """
+    from .models import Blogpost, Comment, PostImage
+
+    published = Blogpost.objects.filter(**PUBLISHED)
+    media = _media_settings()
+    parts = {}
+    info = {}
+    rows = published.order_by().values(
+        'pk', 'slug', 'updated_at', 'author__updated_at',
+        'classification__name', 'classification__color', 'classification__item_count_cache',
+    )
+    for row in rows:
+        parts[row['pk']] = [FORMAT_VERSION, media, row]
+        info[row['pk']] = {'slug': row['slug'], 'tags': [], 'classification': row['classification__name']}
+
+    tag_rows = (
+        Blogpost.tags.through.objects.filter(blogpost__in=published)
+        .order_by('blogpost_id', 'tag_id')
+        .values_list('blogpost_id', 'tag__name', 'tag__color', 'tag__item_count_cache')
+    )
+    for post_pk, *tag in tag_rows:
+        parts[post_pk].append(tag)
+        info[post_pk]['tags'].append(tag[0])
+
+    comment_rows = (
+        Comment.objects.filter(Comment_blog__in=published).order_by()
+        .values('Comment_blog')
+        .annotate(
+            n=Count('pk'), last=Max('Comment_time'), last_id=Max('Comment_id'), changed=Max('updated_at'),
+            users=Max('Comment_user__updated_at'),
+        )
+    )
+    for row in comment_rows:
+        parts[row['Comment_blog']].append(row)
+
+    image_rows = (
+        PostImage.objects.filter(post__in=published).order_by('pk')
+        .values_list('post_id', 'image', 'object_storage_url', 'width', 'height')
+    )
+    for post_pk, *image in image_rows:
+        parts[post_pk].append(image)
+
+    for pk, values in parts.items():
+        info[pk]['fp'] = hashlib.md5(repr(values).encode(), usedforsecurity=False).hexdigest()
+    return info
+
+
+class SnapshotPublisher:
+    def __init__(self, root, workers=1, page_size=20, full=False, keep=3):
+        self.root = Path(root)
+        self.workers = max(1, workers)
+        self.page_size = page_size
+        self.full = full
+        self.keep = keep
+
+    @property
+    def current_link(self):
+        return self.root / 'current'
+
+    def _previous_release(self):
+        if not self.current_link.exists():
+            return None, {}
+        previous = self.current_link.resolve()
+        try:
+            manifest = json.loads((previous / MANIFEST).read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            manifest = {}
+        return previous, manifest.get('posts', {})
+
+    def _render_html(self, items, media_map):
+        from .serializers import render_markdown_safe
+
+        if self.workers == 1 or len(items) < 2:
+            return {pk: render_markdown_safe(content or '', media_map) for pk, content in items}
+        # Forked workers must not share the parent's DB connections.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(media_map,)) as pool:
+            return dict(pool.map(_render_one, items, chunksize=8))
+
+    def publish(self) -> dict:
+        from .media_urls import get_media_url_map
+        from .models import Blogpost, Comment
+        from .serializers import BlogpostSerializer, CommentSerializer
+
+        previous, old_posts = self._previous_release()
+        posts = compute_fingerprints()
+
+        release = self.root / 'releases' / str(time.time_ns())
+        release.mkdir(parents=True)
+
+        changed, details = [], {}
+        for pk, meta in posts.items():
+            old = old_posts.get(str(pk))
+            reusable = (
+                not self.full and previous is not None and old
+                and old['fp'] == meta['fp'] and old['slug'] == meta['slug']
+                and (previous / 'posts' / f"{meta['slug']}.json").exists()
+            )
+            if not reusable:
+                changed.append(pk)
+                continue
+            slug = meta['slug']
+            for name in (f'{slug}.json', f'{slug}.html', f'{slug}/comments.json'):
+                _link_or_copy(previous / 'posts' / name, release / 'posts' / name)
+            details[pk] = json.loads((release / 'posts' / f'{slug}.json').read_text(encoding='utf-8'))
+
+        if changed:
+            items = list(Blogpost.objects.filter(pk__in=changed).values_list('pk', 'Content'))
+            rendered = self._render_html(items, get_media_url_map())
+            qs = Blogpost.objects.filter(pk__in=changed).select_related('author', 'classification').prefetch_related('tags')
+            for data in BlogpostSerializer(qs, many=True, context={'rendered_html': rendered}).data:
+                pk, slug = data['Blog_id'], data['slug']
+                details[pk] = data
+                _dump(release / 'posts' / f'{slug}.json', data)
+                html = render_to_string('myblog/snapshot_post.html', {'post': data})
+                (release / 'posts' / f'{slug}.html').write_text(html, encoding='utf-8')
+                comments = Comment.objects.with_replies().filter(Comment_blog=pk, Comment_parent__isnull=True)
+                tree = CommentSerializer(comments, many=True, context={'max_depth': COMMENT_DEPTH, 'current_depth': 1}).data
+                _dump(release / 'posts' / slug / 'comments.json', tree)
+
+        ordered = list(Blogpost.objects.filter(**PUBLISHED).values_list('pk', flat=True))
+        self._write_pages(release / 'pages', [details[pk] for pk in ordered])
+        by_tag, by_classification = {}, {}
+        for pk in ordered:
+            for tag in posts[pk]['tags']:
+                by_tag.setdefault(tag, []).append(details[pk])
+            if posts[pk]['classification']:
+                by_classification.setdefault(posts[pk]['classification'], []).append(details[pk])
+        for name, items in by_tag.items():
+            self._write_pages(release / 'tags' / quote(name, safe=''), items)
+        for name, items in by_classification.items():
+            self._write_pages(release / 'classifications' / quote(name, safe=''), items)
+
+        _dump(release / MANIFEST, {
+            'format': FORMAT_VERSION,
+            'generated_at': time.time(),
+            'posts': {str(pk): {'slug': meta['slug'], 'fp': meta['fp']} for pk, meta in posts.items()},
+        })
+        self._activate(release)
+        self._prune(release)
+        return {'release': str(release), 'posts': len(posts), 'rendered': len(changed), 'reused': len(posts) - len(changed)}
+
+    def _write_pages(self, directory: Path, items):
+        pages = max(1, math.ceil(len(items) / self.page_size))
+        for page in range(1, pages + 1):
+            chunk = items[(page - 1) * self.page_size:page * self.page_size]
+            _dump(directory / f'page-{page}.json', {'count': len(items), 'page': page, 'pages': pages, 'results': chunk})
+
+    def _activate(self, release: Path):
+        tmp_link = self.root / f'current.{os.getpid()}.tmp'
+        if tmp_link.is_symlink():
+            tmp_link.unlink()
+        tmp_link.symlink_to(release.relative_to(self.root), target_is_directory=True)
+        os.replace(tmp_link, self.current_link)
+
+    def _prune(self, active: Path):
+        releases = sorted(p for p in (self.root / 'releases').iterdir() if p.is_dir())
+        for old in releases[:-self.keep] if self.keep else releases:
+            if old != active:
+                shutil.rmtree(old, ignore_errors=True)
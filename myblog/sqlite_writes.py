@@ -0,0 +1,67 @@
+"""
+Optional in-process write serializer for SQLite.
+
+SQLite allows one writer at a time; with many request threads writing at once
+they queue on the busy timeout and may still fail with "database is locked".
+With ``SQLITE_WRITE_QUEUE`` enabled, ``run()`` hands the write to a single
+worker thread, which keeps its own connection and runs each job in its own
+transaction, so writers of this process wait in a queue instead of on the
+file lock. Other processes still contend on the lock as usual.
+
+Calls made inside an ``atomic()`` block run inline: the worker's connection
+cannot see the caller's uncommitted transaction. On other databases, or with
+the setting off (the default), ``run()`` is a plain call.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+_executor = None
+_executor_lock = threading.Lock()
+_worker = threading.local()
+
+
+def enabled() -> bool:
+    return getattr(settings, 'SQLITE_WRITE_QUEUE', False) and connections[DEFAULT_DB_ALIAS].vendor == 'sqlite'
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='sqlite-writer', initializer=_mark_worker,
+            )
+        return _executor
+
+
+def _mark_worker():
+    _worker.active = True
+
+
+def _in_transaction(fn, args, kwargs):
+    with transaction.atomic():
+        return fn(*args, **kwargs)
+
+
+def run(fn, *args, **kwargs):
+    """Run ``fn(*args, **kwargs)`` on the writer thread and return its result (or raise its error)."""
+    if (
+        not enabled()
+        or getattr(_worker, 'active', False)
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+    ):
+        return fn(*args, **kwargs)
+    return _get_executor().submit(_in_transaction, fn, args, kwargs).result()
+
+
+def shutdown():
+    """Stop the writer thread and close its connection (tests, benchmarks)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.submit(connections.close_all).result()
+        executor.shutdown()
@@ -0,0 +1,136 @@
+"""
+In-process cache of the full Classification/Tag lists.
+
+Both tables are small, read on nearly every page and rarely written. Each
+process keeps the serialized lists in memory together with the global
+taxonomy version they were loaded at.
+
+By default the version is derived from the database: one query for the row
+count and latest ``updated_at`` of both tables, remembered for
+``TAXONOMY_VERSION_TTL`` seconds, so every process sees every write within
+that delay (writes made by the process itself drop it at once). With ``TAXONOMY_CACHE_ALIAS`` set to a shared Redis/Memcached alias
+the version lives there instead and checking it is a single cache ``get``;
+the Tag/Classification save/delete handlers in ``models.py`` bump it, which
+also covers ``item_count_cache`` refreshes since those go through ``save()``.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.dispatch import receiver
+
+VERSION_KEY = 'taxonomy:version'
+
+_lock = threading.Lock()
+_lists = {}
+_db_cached = None
+
+
+def _alias():
+    return getattr(settings, 'TAXONOMY_CACHE_ALIAS', '')
+
+
+def _cache():
+    return caches[_alias()]
+
+
+def _db_version() -> str:
+    from .models import Classification, Tag  # local import to avoid circular deps
+
+    parts = ', '.join(
+        f'(SELECT COUNT(*) FROM {table}), (SELECT MAX(updated_at) FROM {table})'
+        for table in (connection.ops.quote_name(model._meta.db_table) for model in (Classification, Tag))
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {parts}')
+        return repr(cursor.fetchone())
+
+
+def _cached_db_version() -> str:
+    global _db_cached
+    now = time.monotonic()
+    cached = _db_cached
+    if cached is not None and cached[1] > now:
+        return cached[0]
+    version = _db_version()
+    ttl = getattr(settings, 'TAXONOMY_VERSION_TTL', 1)
+    if ttl > 0:
+        _db_cached = (version, now + ttl)
+    return version
+
+
+def _forget_db_version():
+    global _db_cached
+    _db_cached = None
+
+
+@receiver(setting_changed)
+def _reset_version(setting, **kwargs):
+    if setting in ('TAXONOMY_CACHE_ALIAS', 'TAXONOMY_VERSION_TTL'):
+        _forget_db_version()
+
+
+def get_version() -> str:
+    if not _alias():
+        return _cached_db_version()
+    version = _cache().get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not _cache().add(VERSION_KEY, version, None):
+            version = _cache().get(VERSION_KEY) or version
+    return version
+
+
+def _bump():
+    _cache().set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def bump():
+    """Invalidate every process's lists."""
+    if not _alias():
+        # The version is read from the rows themselves; only this process's
+        # remembered copy is stale (again once the write commits).
+        _forget_db_version()
+        if connection.in_atomic_block:
+            transaction.on_commit(_forget_db_version)
+        return
+    _bump()
+    if connection.in_atomic_block:
+        # Another process may reload before the write commits; bump again after.
+        transaction.on_commit(_bump)
+
+
+def _load(model, serializer_class):
+    rows = list(serializer_class(model.objects.order_by('pk'), many=True).data)
+    return rows, {row[model._meta.pk.name]: row for row in rows}
+
+
+def get_lists(model, serializer_class):
+    """``(rows, rows_by_pk)`` for ``model``, reloaded only when the version moved."""
+    version = get_version()
+    cached = _lists.get(model)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _lock:
+        cached = _lists.get(model)
+        if cached is None or cached[0] != version:
+            cached = (version, _load(model, serializer_class))
+            _lists[model] = cached
+    return cached[1]
+
+
+def reload(model, serializer_class):
+    """Load ``model`` again, e.g. when a row referenced by a post is missing."""
+    with _lock:
+        cached = (get_version(), _load(model, serializer_class))
+        _lists[model] = cached
+    return cached[1]
+
+
+def clear():
+    _lists.clear()
+    _forget_db_version()
@@ -0,0 +1,63 @@
+"""
+Summary, word count and reading time derived from a post's rendered Markdown.
+
+Counting is CJK-aware: every Han/Kana/Hangul character counts as one word,
+other text is split on whitespace and punctuation. Reading time assumes
+``CJK_CHARS_PER_MINUTE`` for CJK characters and ``WORDS_PER_MINUTE`` for the
+rest. ``Blogpost.save()`` stores the results in columns whenever ``Content``
+changes; ``backfill_post_stats`` fills existing rows.
+"""
+import html
+import math
+import re
+
+from django.utils.html import strip_tags
+
+SUMMARY_LENGTH = 120
+WORDS_PER_MINUTE = 200
+CJK_CHARS_PER_MINUTE = 300
+
+CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\U00020000-\U0002ffff]')
+WORD_RE = re.compile(r"[^\W_]+(?:['’.-][^\W_]+)*")
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def plain_text(rendered_html: str) -> str:
+    return WHITESPACE_RE.sub(' ', html.unescape(strip_tags(rendered_html))).strip()
+
+
+def count_words(text: str) -> tuple[int, int]:
+    """``(cjk_chars, other_words)``."""
+    cjk = len(CJK_RE.findall(text))
+    others = len(WORD_RE.findall(CJK_RE.sub(' ', text)))
+    return cjk, others
+
+
+def reading_minutes(cjk: int, others: int) -> int:
+    if not cjk and not others:
+        return 0
+    return max(1, math.ceil(cjk / CJK_CHARS_PER_MINUTE + others / WORDS_PER_MINUTE))
+
+
+def make_summary(text: str, length: int = SUMMARY_LENGTH) -> str:
+    if len(text) <= length:
+        return text
+    cut = text[:length]
+    # Prefer not to split a latin word; CJK text can be cut anywhere.
+    if text[length].isalnum() and ' ' in cut[length // 2:]:
+        cut = cut[:cut.rindex(' ')]
+    return cut.rstrip() + '…'
+
+
+def compute(content: str) -> dict:
+    """``{'summary', 'word_count', 'reading_time'}`` for Markdown ``content``."""
+    from .serializers import render_markdown_safe  # local import to avoid circular deps
+
+    # Media URL rewriting does not change the text, so skip the map lookup.
+    text = plain_text(render_markdown_safe(content or '', media_map={}))
+    cjk, others = count_words(text)
+    return {
+        'summary': make_summary(text),
+        'word_count': cjk + others,
+        'reading_time': reading_minutes(cjk, others),
+    }
@@ -0,0 +1,223 @@
+"""
+Token-bucket throttles that shed bursts of comment posts and registrations.
+
+Each client (the user pk when authenticated, otherwise the IP from DRF's
+``get_ident()``; always the IP for registrations, which log the new user in)
+gets a bucket per scope holding up to ``BURST[scope]`` tokens, refilled at ``RATES[scope]`` (``'10/min'``, DRF's rate syntax). A
+write takes a token; an empty bucket is answered with 429 and a
+``Retry-After`` of the time until the next token. The throttles run in
+DRF's ``initial()``, before the view loads the post or validates the
+serializer, and the check touches only the bucket store, never the
+database. Reads on the same routes are not throttled. The IP is only as
+trustworthy as ``REST_FRAMEWORK['NUM_PROXIES']``: it must match the number
+of reverse proxies, or ``X-Forwarded-For`` can be forged.
+
+Backends (``settings.THROTTLE['BACKEND']``):
+
+* ``locmem`` - buckets in a bounded in-process LRU; limits are per process.
+* ``django`` - buckets in a shared ``CACHES`` alias (Redis/Memcached), so
+  limits hold across processes. Read-modify-write is not atomic: a few
+  concurrent requests from one client may slip past the limit.
+
+With ``ADAPTIVE`` on, the views time their writes (``timed_write()``) and
+keep a moving average; once it exceeds ``TARGET_LATENCY_MS`` the refill
+rate and burst of every bucket are scaled down by ``target / average``
+(not below ``MIN_FACTOR``), and recover as writes get fast again. The
+average is per process and forgotten after ``STALE_AFTER`` seconds without
+writes.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from .lru import LRUCache
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BACKEND': 'locmem',
+    'CACHE_ALIAS': 'default',
+    'MAX_ENTRIES': 100000,
+    'RATES': {
+        'comment': '10/min',
+        'registration': '5/hour',
+    },
+    'BURST': {
+        'comment': 5,
+        'registration': 3,
+    },
+    'ADAPTIVE': False,
+    'TARGET_LATENCY_MS': 100,
+    'MIN_FACTOR': 0.1,
+    'EWMA_ALPHA': 0.2,
+    'STALE_AFTER': 30,
+}
+KEY_PREFIX = 'throttle:'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'THROTTLE', {})}
+
+
+def parse_rate(rate) -> float:
+    """``'10/min'`` -> tokens per second."""
+    num, period = rate.split('/')
+    return int(num) / PERIODS[period[0]]
+
+
+def _refill(state, capacity, rate, now):
+    """``(tokens, wait)`` after taking one token from ``state`` (``(tokens, stamp)`` or None)."""
+    tokens, stamp = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - stamp) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class LocMemBackend:
+    def __init__(self, config):
+        self._buckets = LRUCache(max_entries=config['MAX_ENTRIES'])
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate) -> float:
+        """Take a token; returns 0 when allowed, else seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, wait = _refill(self._buckets.get(key), capacity, rate, now)
+            # A bucket left alone until full is the same as no bucket.
+            self._buckets.set(key, (tokens, now), ttl=math.ceil(capacity / rate))
+        return wait
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class DjangoCacheBackend:
+    def __init__(self, config):
+        self._cache = caches[config['CACHE_ALIAS']]
+
+    def consume(self, key, capacity, rate) -> float:
+        now = time.time()
+        tokens, wait = _refill(self._cache.get(f'{KEY_PREFIX}{key}'), capacity, rate, now)
+        self._cache.set(f'{KEY_PREFIX}{key}', (tokens, now), math.ceil(capacity / rate))
+        return wait
+
+    def clear(self):
+        pass
+
+
+BACKENDS = {
+    'locmem': LocMemBackend,
+    'django': DjangoCacheBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        config = get_config()
+        _backend = BACKENDS[config['BACKEND']](config)
+    return _backend
+
+
+class WriteLatency:
+    """Per-process exponentially weighted moving average of write durations."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.average = None
+        self.updated = 0.0
+
+    def record(self, seconds, alpha):
+        with self._lock:
+            self.average = seconds if self.average is None else alpha * seconds + (1 - alpha) * self.average
+            self.updated = time.monotonic()
+
+    def factor(self, config) -> float:
+        """Share of the configured rate to allow, in ``[MIN_FACTOR, 1]``."""
+        average = self.average
+        if average is None or time.monotonic() - self.updated > config['STALE_AFTER']:
+            return 1.0
+        target = config['TARGET_LATENCY_MS'] / 1000
+        if average <= target:
+            return 1.0
+        return max(config['MIN_FACTOR'], target / average)
+
+
+write_latency = WriteLatency()
+
+
+@receiver(setting_changed)
+def _reset_throttles(setting, **kwargs):
+    global _backend
+    if setting in ('THROTTLE', 'CACHES'):
+        _backend = None
+        write_latency.reset()
+
+
+@contextmanager
+def timed_write():
+    """Feed the duration of the enclosed write into the adaptive average."""
+    config = get_config()
+    if not (config['ENABLED'] and config['ADAPTIVE']):
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        write_latency.record(time.perf_counter() - started, config['EWMA_ALPHA'])
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttles unsafe requests in ``scope``; subclasses set the scope."""
+
+    scope = None
+
+    def get_cache_key(self, request, view):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'{self.scope}:user:{user.pk}'
+        return f'{self.scope}:ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        self._wait = 0.0
+        config = get_config()
+        if not config['ENABLED'] or request.method in SAFE_METHODS:
+            return True
+        rate = parse_rate(config['RATES'][self.scope])
+        burst = config['BURST'][self.scope]
+        if config['ADAPTIVE']:
+            factor = write_latency.factor(config)
+            rate, burst = rate * factor, max(1.0, burst * factor)
+        self._wait = get_backend().consume(self.get_cache_key(request, view), burst, rate)
+        return self._wait == 0
+
+    def wait(self):
+        return self._wait
+
+
+class CommentThrottle(TokenBucketThrottle):
+    scope = 'comment'
+
+
+class RegistrationThrottle(TokenBucketThrottle):
+    scope = 'registration'
+
+    def get_cache_key(self, request, view):
+        # Registering logs the new user in; keying on it would hand every
+        # reused session a fresh bucket.
+        return f'{self.scope}:ip:{self.get_ident(request)}'
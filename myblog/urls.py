@@ -1,6 +1,12 @@
+from django.conf import settings
+from django.urls import path, re_path
 from rest_framework.routers import DefaultRouter
+from .async_views import async_read_urls, post_comment_stream
+from .feeds import feed_view
 from .views import (
+    ArchiveView,
     BlogpostViewSet,
+    CacheMetricsView,
     CommentViewSet,
     ClassificationViewSet,
     TagViewSet,
@@ -12,4 +18,18 @@ router.register(r'comments', CommentViewSet, basename='comment')
 router.register(r'classifications', ClassificationViewSet, basename='classification')
 router.register(r'tags', TagViewSet, basename='tag')
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('archive/', ArchiveView.as_view(), name='archive'),
+    re_path(r'^posts/(?P<slug>[^/.]+)/comments/stream/$', post_comment_stream, name='post-comment-stream'),
+    path('cache-metrics/', CacheMetricsView.as_view(), name='cache-metrics'),
+    re_path(r'^feeds/(?P<kind>rss|atom)/$', feed_view, name='feed'),
+    re_path(
+        r'^feeds/classifications/(?P<name>[^/]+)/(?P<kind>rss|atom)/$',
+        feed_view, {'scope': 'classification'}, name='classification-feed',
+    ),
+    re_path(r'^feeds/tags/(?P<name>[^/]+)/(?P<kind>rss|atom)/$', feed_view, {'scope': 'tag'}, name='tag-feed'),
+] + router.urls
+
+if settings.ASYNC_READ_VIEWS:
+    # ASGI: anonymous JSON reads go to the native async views first.
+    urlpatterns = async_read_urls(router.urls) + urlpatterns
@@ -1,13 +1,42 @@
+from django.core import signing
 from django.utils.dateparse import parse_datetime
-from django.db import models
+from django.db import models, transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, BasePermission, SAFE_METHODS
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticatedOrReadOnly, BasePermission, SAFE_METHODS
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from dj_rest_auth.registration.views import RegisterView
 
-from .models import Blogpost, Comment, Classification, Tag
-from .serializers import BlogpostSerializer, CommentSerializer, ClassificationSerializer, TagSerializer
+from . import archive, chunked_upload, fast_serializers, object_storage, taxonomy_cache
+from . import response_cache, sqlite_writes, throttling
+from .db_router import ReplicaReadMixin
+from .response_cache import ResponseCacheMixin, comment_tags, post_tags
+from .conditional import (
+    ConditionalGetMixin,
+    comment_aggregates,
+    media_fingerprint,
+    post_aggregates,
+    taxonomy_fingerprint,
+)
+from .models import Blogpost, Comment, Classification, Tag, PostImage, cover_upload_to, post_image_upload_to
+from .serializers import (
+    POST_CARD_FIELDS,
+    POST_READ_FIELDS,
+    BlogpostSerializer,
+    CommentSerializer,
+    ClassificationSerializer,
+    TagSerializer,
+    PostImageSerializer,
+    DirectUploadSerializer,
+    DirectUploadCompleteSerializer,
+    ChunkedUploadSerializer,
+    resolve_fieldset,
+)
+
+DIRECT_UPLOAD_SALT = 'myblog.direct-upload'
 
 
 class IsAuthorOrAdminOrReadOnly(BasePermission):
@@ -29,13 +58,126 @@ class IsAuthorOrAdminOrReadOnly(BasePermission):
         return user.is_staff or user.is_superuser or getattr(obj, 'author', None) == user
 
 
-class BlogpostViewSet(viewsets.ModelViewSet):
+def _post_cache_tags(post):
+    # content_html embeds image URLs, and any post may embed any image.
+    tags = {'media', *post_tags(post['Blog_id'])}
+    # Sideloaded rows only hold the Userid; those tags come from the users map.
+    if isinstance(post.get('author'), dict):
+        tags.add(f"user:{post['author']['Userid']}")
+    if post.get('classification'):
+        tags.add(f"classification:{post['classification']['name']}")
+    tags.update(f"tag:{tag['name']}" for tag in post.get('tags', []))
+    return tags
+
+
+def _comment_cache_tags(comments):
+    tags = set()
+    for comment in comments:
+        if isinstance(comment.get('Comment_user'), dict):
+            tags.add(f"user:{comment['Comment_user']['Userid']}")
+        tags |= _comment_cache_tags(comment.get('replies', []))
+    return tags
+
+
+def _split_sideloaded(data):
+    """``(rows, user tags)`` for a payload that may be wrapped by ``?include=users``."""
+    if isinstance(data, dict) and 'users' in data and 'results' in data:
+        return data['results'], {f'user:{pk}' for pk in data['users']}
+    return data, set()
+
+
+class SideloadUsersMixin:
+    """
+    ``?include=users`` on list responses: rows reference users by Userid and
+    each user is emitted once in a top-level ``users`` map::
+
+        {"results": [...], "users": {"<Userid>": {...}}}
+    """
+    sideload_actions = ('list',)
+
+    def sideloads_users(self):
+        return (
+            self.request.method in ('GET', 'HEAD')
+            and self.action in self.sideload_actions
+            and 'users' in self.request.query_params.get('include', '').split(',')
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.sideloads_users():
+            context['sideloaded_user_ids'] = self._sideloaded_user_ids = set()
+        return context
+
+    def with_sideloaded_users(self, response):
+        user_ids = getattr(self, '_sideloaded_user_ids', None)
+        if user_ids is None or response.status_code != 200:
+            return response
+        self._sideloaded_user_ids = None
+        users = fast_serializers.serialize_users(user_ids, {'request': self.request})
+        response.data = {'results': response.data, 'users': users}
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.with_sideloaded_users(super().list(request, *args, **kwargs))
+
+
+class FastListMixin:
+    """Build unpaginated list payloads with a ``fast_serializers`` function."""
+    fast_list_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        if self.fast_list_serializer is None or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.fast_list_serializer(queryset, self.get_serializer_context()))
+
+
+class BlogpostViewSet(
+    ReplicaReadMixin,
+    ResponseCacheMixin,
+    ConditionalGetMixin,
+    SideloadUsersMixin,
+    FastListMixin,
+    viewsets.ModelViewSet,
+):
     serializer_class = BlogpostSerializer
+    fast_list_serializer = staticmethod(fast_serializers.serialize_posts)
     permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrAdminOrReadOnly]
     lookup_field = 'slug'
+    cached_actions = ('list', 'retrieve', 'comments')
+    sideload_actions = ('list', 'comments')
+
+    def get_fieldset(self):
+        """Sparse fieldset for reads; lists default to the compact card."""
+        if self.request.method not in ('GET', 'HEAD') or self.action not in ('list', 'retrieve'):
+            return None
+        return resolve_fieldset(
+            self.request.query_params,
+            POST_CARD_FIELDS if self.action == 'list' else POST_READ_FIELDS,
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            context['fields'] = fieldset
+        return context
 
     def get_queryset(self):
-        qs = Blogpost.objects.select_related('author', 'classification').prefetch_related('tags')
+        fieldset = self.get_fieldset()
+        wanted = set(fieldset or POST_READ_FIELDS)
+        qs = Blogpost.objects.all()
+        related = [name for name in ('author', 'classification') if name in wanted]
+        if related:
+            qs = qs.select_related(*related)
+        if 'tags' in wanted:
+            qs = qs.prefetch_related('tags')
+        # Large text columns nobody asked for are never read.
+        deferred = [name for name in ('Content', 'summary') if name not in wanted]
+        if 'content_html' in wanted and 'Content' in deferred:
+            deferred.remove('Content')
+        if deferred:
+            qs = qs.defer(*deferred)
         params = self.request.query_params
 
         classification_param = params.get('classification')
@@ -50,17 +192,21 @@ class BlogpostViewSet(viewsets.ModelViewSet):
                 q_obj |= models.Q(classification_id__in=ids)
             qs = qs.filter(q_obj)
 
-        tags_param = params.getlist('tags') or params.get('tags')
+        tags_param = [v for value in params.getlist('tags') for v in value.split(',') if v]
         if tags_param:
-            if not isinstance(tags_param, list):
-                tags_param = [v for v in tags_param.split(',') if v]
-            tag_filters = []
-            for tag in tags_param:
-                if str(tag).isdigit():
-                    tag_filters.append(int(tag))
-                else:
-                    tag_filters.append(tag)
-            qs = qs.filter(models.Q(tags__pk__in=[v for v in tag_filters if isinstance(v, int)]) | models.Q(tags__name__in=[v for v in tag_filters if isinstance(v, str)])).distinct()
+            # Tag's primary key is its name, so ids and names hit the same column.
+            names = set(tags_param)
+            through = Blogpost.tags.through.objects.filter(tag_id__in=names)
+            if params.get('tags_mode') == 'all':
+                matching = (
+                    through.order_by().values('blogpost_id')
+                    .annotate(n=models.Count('tag_id'))
+                    .filter(n=len(names))
+                    .values('blogpost_id')
+                )
+                qs = qs.filter(pk__in=matching)
+            else:
+                qs = qs.filter(models.Exists(through.filter(blogpost_id=models.OuterRef('pk'))))
 
         status_param = params.get('status') or params.get('Blog_status')
         if status_param is not None:
@@ -87,49 +233,235 @@ class BlogpostViewSet(viewsets.ModelViewSet):
 
         return qs
 
-    def get_object(self):
+    def _lookup_filter(self):
         lookup_value = self.kwargs.get(self.lookup_field)
-        qs = self.get_queryset()
         if lookup_value and str(lookup_value).isdigit():
-            obj = get_object_or_404(qs, pk=lookup_value)
-        else:
-            obj = get_object_or_404(qs, slug=lookup_value)
+            return {'pk': lookup_value}
+        return {'slug': lookup_value}
 
+    def get_object(self):
+        obj = get_object_or_404(self.get_queryset(), **self._lookup_filter())
         self.check_object_permissions(self.request, obj)
         return obj
 
+    def get_cache_base_tags(self, request):
+        if self.action == 'list':
+            return {'posts'}
+        if self.action not in ('retrieve', 'comments'):
+            return set()
+        post_pk = self.get_queryset().filter(**self._lookup_filter()).values_list('pk', flat=True).first()
+        if not post_pk:
+            return set()
+        return set(post_tags(post_pk) if self.action == 'retrieve' else comment_tags(post_pk))
+
+    def get_cache_tags(self, data):
+        data, tags = _split_sideloaded(data)
+        if self.action == 'list':
+            return tags.union(*(_post_cache_tags(post) for post in data))
+        if self.action == 'retrieve':
+            return _post_cache_tags(data)
+        return tags | _comment_cache_tags(data)
+
+    def get_validators(self, request):
+        if self.action == 'list':
+            return (post_aggregates(self.get_queryset()), taxonomy_fingerprint(), media_fingerprint()), None
+        if self.action == 'retrieve':
+            agg = post_aggregates(self.get_queryset().filter(**self._lookup_filter()))
+            if not agg['count']:
+                return None
+            last_modified = max(filter(None, [agg['last'], agg['author_last']]))
+            return (agg, taxonomy_fingerprint(), media_fingerprint()), last_modified
+        if self.action == 'comments':
+            post_pk = self.get_queryset().filter(**self._lookup_filter()).values_list('pk', flat=True).first()
+            if post_pk is None:
+                return None
+            return comment_aggregates(Comment.objects.filter(Comment_blog_id=post_pk)), None
+        return None
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user if self.request.user.is_authenticated else None)
 
-    @action(detail=True, methods=['get', 'post'], url_path='comments', permission_classes=[IsAuthenticatedOrReadOnly])
+    @action(
+        detail=True, methods=['get', 'post'], url_path='comments',
+        permission_classes=[IsAuthenticatedOrReadOnly], throttle_classes=[throttling.CommentThrottle],
+    )
     def comments(self, request, **kwargs):
-        post = self.get_object()
         if request.method.lower() == 'get':
-            max_depth = request.query_params.get('depth')
-            try:
-                max_depth_val = int(max_depth) if max_depth is not None else 2
-            except ValueError:
-                max_depth_val = 2
-            comments_qs = Comment.objects.with_replies().filter(Comment_blog=post, Comment_parent__isnull=True)
-            serializer = CommentSerializer(
-                comments_qs,
-                many=True,
-                context={
-                    'request': request,
-                    'max_depth': max_depth_val,
-                    'current_depth': 1,
-                }
-            )
-            return Response(serializer.data)
+            return self.serve_cached(request, lambda: self._comment_tree(request))
 
+        post = self.get_object()
         serializer = CommentSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        serializer.save(Comment_blog=post)
+        with throttling.timed_write():
+            sqlite_writes.run(serializer.save, Comment_blog=post)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def _comment_tree(self, request):
+        not_modified = self.check_not_modified(request)
+        if not_modified:
+            return not_modified
+        post = self.get_object()
+        max_depth = request.query_params.get('depth')
+        try:
+            max_depth_val = int(max_depth) if max_depth is not None else 2
+        except ValueError:
+            max_depth_val = 2
+        comments_qs = Comment.objects.filter(Comment_blog=post, Comment_parent__isnull=True)
+        data = fast_serializers.serialize_comments(
+            comments_qs,
+            {
+                **self.get_serializer_context(),
+                'max_depth': max_depth_val,
+                'current_depth': 1,
+            }
+        )
+        return self.with_sideloaded_users(Response(data))
+
+    @action(detail=True, methods=['post'], url_path='direct-uploads')
+    def direct_uploads(self, request, **kwargs):
+        """
+        Issue a presigned URL so the browser uploads straight to object storage.
+        Keys follow the same layout as locally stored covers/post images.
+        """
+        post = self.get_object()
+        if not object_storage.is_enabled():
+            return Response({'detail': '对象存储未启用'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        serializer = DirectUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        if data['kind'] == 'cover':
+            key = cover_upload_to(post, data['filename'])
+        else:
+            key = post_image_upload_to(PostImage(post=post), data['filename'])
+        if data['method'] == 'post':
+            upload = object_storage.presign_post(key, data['content_type'], data['size'])
+        else:
+            upload = object_storage.presign_put(key, data['content_type'], data['size'])
+
+        token = signing.dumps({
+            'post': post.pk, 'kind': data['kind'], 'key': key,
+            'content_type': data['content_type'], 'size': data['size'],
+        }, salt=DIRECT_UPLOAD_SALT)
+        return Response({'key': key, 'upload_token': token, **upload}, status=status.HTTP_201_CREATED)
 
-class CommentViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['post'], url_path='direct-uploads/complete')
+    def complete_direct_upload(self, request, **kwargs):
+        """
+        Register an object uploaded through a presigned URL. The stored object
+        must match the size and type the token was issued for; completing the
+        same token again returns the already registered image.
+        """
+        post = self.get_object()
+        if not object_storage.is_enabled():
+            return Response({'detail': '对象存储未启用'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        serializer = DirectUploadCompleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            payload = signing.loads(
+                serializer.validated_data['upload_token'],
+                salt=DIRECT_UPLOAD_SALT,
+                max_age=object_storage._get_config().get('presign_expires', 900) * 2,
+            )
+        except signing.BadSignature:
+            return Response({'detail': '上传凭证无效或已过期'}, status=status.HTTP_400_BAD_REQUEST)
+        if payload['post'] != post.pk:
+            return Response({'detail': '上传凭证与文章不匹配'}, status=status.HTTP_400_BAD_REQUEST)
+
+        key = payload['key']
+        head = object_storage.head_object(key)
+        if head is None:
+            return Response({'detail': '对象尚未上传完成'}, status=status.HTTP_400_BAD_REQUEST)
+        if head.get('ContentLength') != payload['size'] or head.get('ContentType') != payload['content_type']:
+            return Response({'detail': '上传的对象与申请的大小或类型不符'}, status=status.HTTP_400_BAD_REQUEST)
+        remote_url = object_storage.build_public_url(key)
+
+        with transaction.atomic():
+            # Serialises concurrent completions of the same token.
+            post = Blogpost.objects.select_for_update().get(pk=post.pk)
+            if payload['kind'] == 'cover':
+                if post.cover_image.name != key:
+                    post.cover_image.name = key
+                    post.cover_object_url = remote_url
+                    post.save(update_fields=['cover_image', 'cover_object_url', 'updated_at'])
+                return Response(BlogpostSerializer(post, context=self.get_serializer_context()).data)
+
+            image = PostImage.objects.filter(post=post, image=key).first()
+            if image is not None:
+                return Response(PostImageSerializer(image).data)
+            image = PostImage(post=post, object_storage_url=remote_url)
+            image.image.name = key
+            image.save()
+        return Response(PostImageSerializer(image).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='image-uploads')
+    def image_uploads(self, request, **kwargs):
+        """Start a resumable chunked upload for a post image."""
+        post = self.get_object()
+        serializer = ChunkedUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        meta = chunked_upload.create_session(post.pk, **serializer.validated_data)
+        return Response({
+            'upload_id': meta['upload_id'],
+            'offset': 0,
+            'size': meta['size'],
+            'max_chunk_size': chunked_upload.MAX_CHUNK_SIZE,
+        }, status=status.HTTP_201_CREATED)
+
+    def _get_upload_session(self, post, upload_id):
+        meta = chunked_upload.load_session(upload_id)
+        if not meta or meta['post'] != post.pk:
+            return None
+        return meta
+
+    @action(detail=True, methods=['get', 'put'], url_path=r'image-uploads/(?P<upload_id>[0-9a-f]{32})')
+    def image_upload_chunk(self, request, upload_id=None, **kwargs):
+        """
+        GET reports the committed offset (resume point). PUT appends the raw
+        request body at the ``Upload-Offset`` header; the body is streamed to
+        disk and never parsed by DRF.
+        """
+        post = self.get_object()
+        meta = self._get_upload_session(post, upload_id)
+        if meta is None:
+            return Response({'detail': '上传会话不存在'}, status=status.HTTP_404_NOT_FOUND)
+        if request.method == 'GET':
+            return Response({'offset': chunked_upload.current_offset(upload_id), 'size': meta['size']})
+
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length', ''))
+        except ValueError:
+            return Response({'detail': '缺少 Upload-Offset 或 Content-Length'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            new_offset = chunked_upload.append_chunk(meta, offset, request._request, length)
+        except chunked_upload.OffsetMismatch as exc:
+            return Response({'detail': str(exc), 'offset': exc.expected}, status=status.HTTP_409_CONFLICT)
+        except chunked_upload.UploadError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'offset': new_offset, 'size': meta['size']})
+
+    @action(detail=True, methods=['post'], url_path=r'image-uploads/(?P<upload_id>[0-9a-f]{32})/complete')
+    def complete_image_upload(self, request, upload_id=None, **kwargs):
+        post = self.get_object()
+        meta = self._get_upload_session(post, upload_id)
+        if meta is None:
+            return Response({'detail': '上传会话不存在'}, status=status.HTTP_404_NOT_FOUND)
+        image = PostImage(post=post)
+        target = post_image_upload_to(image, meta['filename'])
+        try:
+            image.image.name = chunked_upload.finalize(meta, target)
+        except chunked_upload.UploadConflict as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+        except chunked_upload.UploadError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        image.save()
+        return Response(PostImageSerializer(image).data, status=status.HTTP_201_CREATED)
+
+
+class CommentViewSet(ReplicaReadMixin, ConditionalGetMixin, SideloadUsersMixin, FastListMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
+    fast_list_serializer = staticmethod(fast_serializers.serialize_comments)
     permission_classes = [IsAuthenticatedOrReadOnly]
     queryset = Comment.objects.with_replies().select_related('Comment_user', 'Comment_blog', 'Comment_parent')
     http_method_names = ['get', 'post', 'patch', 'put', 'delete']
@@ -144,14 +476,82 @@ class CommentViewSet(viewsets.ModelViewSet):
             qs = qs.filter(Comment_parent=parent_id)
         return qs
 
+    def get_throttles(self):
+        # Only posting spends the comment budget; edits and deletes do not.
+        if self.action == 'create':
+            return [throttling.CommentThrottle()]
+        return super().get_throttles()
+
+    def perform_create(self, serializer):
+        with throttling.timed_write():
+            sqlite_writes.run(serializer.save)
 
-class ClassificationViewSet(viewsets.ReadOnlyModelViewSet):
+    def get_validators(self, request):
+        if self.action == 'list':
+            return comment_aggregates(self.get_queryset()), None
+        if self.action == 'retrieve':
+            agg = comment_aggregates(self.get_queryset().filter(pk=self.kwargs.get('pk')))
+            if not agg['count']:
+                return None
+            # Replies are nested in the detail payload, so include them too.
+            replies = comment_aggregates(Comment.objects.filter(Comment_parent=self.kwargs.get('pk')))
+            return (agg, replies), None
+        return None
+
+
+class TaxonomyConditionalMixin(ConditionalGetMixin):
+    def get_validators(self, request):
+        # The request path is part of the ETag, so list and detail differ.
+        return taxonomy_fingerprint(), None
+
+
+class CachedTaxonomyMixin:
+    """Serve list/detail from the per-process taxonomy cache."""
+
+    def list(self, request, *args, **kwargs):
+        rows, _ = taxonomy_cache.get_lists(self.queryset.model, self.get_serializer_class())
+        return Response(rows)
+
+    def retrieve(self, request, *args, **kwargs):
+        _, by_pk = taxonomy_cache.get_lists(self.queryset.model, self.get_serializer_class())
+        row = by_pk.get(kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        if row is None:
+            raise Http404
+        return Response(row)
+
+
+class ClassificationViewSet(TaxonomyConditionalMixin, CachedTaxonomyMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ClassificationSerializer
     queryset = Classification.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(TaxonomyConditionalMixin, CachedTaxonomyMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
+
+
+class CacheMetricsView(APIView):
+    """响应缓存命中/合并等待等计数（当前进程）"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(response_cache.metrics())
+
+
+class ArchiveView(APIView):
+    """归档侧栏：按年/月、分类、标签、作者的已发布文章数（读预计算表）"""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response(archive.get_archive())
+
+
+class ThrottledRegisterView(RegisterView):
+    """注册接口：按 IP 令牌桶限流，在序列化器校验之前拒绝突发请求"""
+    throttle_classes = [throttling.RegistrationThrottle]
+
+    def perform_create(self, serializer):
+        with throttling.timed_write():
+            return super().perform_create(serializer)